@@ -3,4 +3,8 @@ from project import create_app
 app = create_app()
 
 if __name__ == '__main__':
+    # 开发服务器启动前执行迁移；生产部署请在发布时运行 flask manage migrate-db
+    from project.migrations import upgrade
+    with app.app_context():
+        upgrade()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""基准测试共用的工具：临时数据库上的应用、独立进程中的 HTTP 服务、延迟统计与结果输出。"""
+import datetime
+import http.cookiejar
+import json
+import math
+import os
+import subprocess
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from multiprocessing import Process
+from config import TestingConfig
+
+
+def make_config(db_path, **overrides):
+    attrs = {'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path, **overrides}
+    return type('BenchmarkConfig', (TestingConfig,), attrs)
+
+
+def temp_db_path():
+    fd, path = tempfile.mkstemp(prefix='study_tracker_bench_', suffix='.db')
+    os.close(fd)
+    os.remove(path)
+    return path
+
+
+def percentile(sorted_values, p):
+    """最近秩法百分位数，sorted_values 必须已排序。"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, wall_seconds=None):
+    """把一组以秒为单位的延迟汇总为 p50/p95/p99（毫秒）和每秒请求数。"""
+    values = sorted(latencies)
+    total = wall_seconds if wall_seconds is not None else sum(values)
+    return {
+        'count': len(values),
+        'rps': round(len(values) / total, 1) if total else None,
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else None,
+        'p50_ms': round(percentile(values, 50) * 1000, 3) if values else None,
+        'p95_ms': round(percentile(values, 95) * 1000, 3) if values else None,
+        'p99_ms': round(percentile(values, 99) * 1000, 3) if values else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(path, name, params, results):
+    report = {
+        'benchmark': name,
+        'commit': git_commit(),
+        'created_at': datetime.datetime.utcnow().isoformat() + 'Z',
+        'params': params,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+# --- 独立进程中的 HTTP 服务 ---
+def _serve(config_class, port):
+    import logging
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    import signal
+    from project import create_app, passwords
+    app = create_app(config_class)
+
+    def _stop(signum, frame):
+        # 连同密码哈希进程池一起退出
+        passwords.service.shutdown()
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, _stop)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def start_server(config_class, port):
+    # 非守护进程：服务进程中可能还会启动密码哈希进程池；由调用方负责 terminate
+    process = Process(target=_serve, args=(config_class, port))
+    process.start()
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('基准测试服务未能在 15 秒内启动')
+
+
+class HttpClient:
+    """带 cookie 的最小 HTTP 客户端，只依赖标准库，供负载生成进程使用。"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, json_body=None, form=None):
+        data, headers = None, {}
+        if json_body is not None:
+            data, headers = json.dumps(json_body).encode(), {'Content-Type': 'application/json'}
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def login(self, username, password):
+        return self.request('POST', '/login', form={'username': username, 'password': password})
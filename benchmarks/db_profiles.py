@@ -0,0 +1,103 @@
+"""对比不同数据库配置档（DB_PROFILE）在多进程并发读写下的吞吐量。
+
+每个配置档使用一个新的临时 SQLite 文件（WAL 模式会写入数据库文件，不能复用），生成合成数据后
+启动若干读进程和写进程，模拟多个 gunicorn worker 同时访问同一个数据库：
+  * 读进程循环请求 /get_study_data 与 /sessions；
+  * 写进程循环执行 开始 → 暂停 → 继续 → 结束 会话。
+各进程通过 Flask 测试客户端直接访问数据库（不含网络开销），“database is locked” 等错误计入 errors。
+
+用法（在项目根目录执行）：
+    python -m benchmarks.db_profiles --readers 4 --writers 4 --duration 10 --output bench_db_profiles.json
+"""
+import argparse
+import os
+import time
+from multiprocessing import Pool
+from sqlalchemy.exc import OperationalError
+from benchmarks.common import make_config, temp_db_path, summarize, write_report
+from benchmarks.hot_routes import read_scenarios, session_cycle
+
+
+def _worker(args):
+    profile, db_path, role, username, password, duration = args
+    from project import create_app
+    app = create_app(make_config(db_path, DB_PROFILE=profile))
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': password})
+    subject_id = client.get('/subjects').get_json()[0]['id']
+
+    def call(method, path, body):
+        return client.open(path, method=method, json=body).status_code
+
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if role == 'read':
+                for _, path in read_scenarios()[1:] + [('sessions', '/sessions')]:
+                    errors += client.get(path).status_code >= 400
+            else:
+                errors += sum(status >= 400 for _, _, status in session_cycle(call, subject_id))
+        except OperationalError:
+            errors += 1
+            # 写入失败时可能留下进行中的会话，结束它以便下一轮重新开始
+            call('POST', '/stop_session', None)
+        latencies.append(time.perf_counter() - started)
+    return role, latencies, errors
+
+
+def run_profile(profile, args):
+    from project import create_app
+    from tests.seed import seed_synthetic_data, SEED_PASSWORD
+
+    db_path = temp_db_path()
+    try:
+        app = create_app(make_config(db_path, DB_PROFILE=profile))
+        with app.app_context():
+            # 每个写进程使用不同的用户，避免“每个用户只有一个进行中会话”的限制互相干扰
+            usernames = seed_synthetic_data(max(args.writers, 1) + 1, args.subjects, args.sessions)
+        jobs = [(profile, db_path, 'read', usernames[-1], SEED_PASSWORD, args.duration) for _ in range(args.readers)]
+        jobs += [(profile, db_path, 'write', usernames[i], SEED_PASSWORD, args.duration) for i in range(args.writers)]
+        started = time.perf_counter()
+        with Pool(len(jobs)) as pool:
+            outputs = pool.map(_worker, jobs)
+        wall = time.perf_counter() - started
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    results = {}
+    for role in ('read', 'write'):
+        latencies = [v for r, values, _ in outputs if r == role for v in values]
+        results[role] = summarize(latencies, wall)
+        results[role]['errors'] = sum(e for r, _, e in outputs if r == role)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=['development', 'production'])
+    parser.add_argument('--readers', type=int, default=4, help='读进程数')
+    parser.add_argument('--writers', type=int, default=4, help='写进程数')
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--sessions', type=int, default=2000, help='每个用户的会话数')
+    parser.add_argument('--duration', type=float, default=10.0, help='每个配置档的持续秒数')
+    parser.add_argument('--output', default='bench_db_profiles.json')
+    args = parser.parse_args()
+
+    results = {profile: run_profile(profile, args) for profile in args.profiles}
+
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    write_report(args.output, 'db_profiles', params, results)
+    for profile, roles in results.items():
+        print(f'[{profile}]')
+        for role, stats in roles.items():
+            print(f"  {role:<6} 轮次/秒={stats['rps']:<8} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                  f"p99={stats['p99_ms']}ms errors={stats['errors']}")
+    print(f'结果已写入 {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""热点路由的基准测试。
+
+先在临时 SQLite 文件上生成 用户 × 科目 × 会话 的合成数据，然后：
+  1. 用 Flask 测试客户端在进程内逐个调用各路由（不含网络开销）；
+  2. 启动独立的 HTTP 服务，用多个进程并发发起请求。
+最后把各场景的 p50/p95/p99 延迟与每秒请求数写入 JSON 文件，便于在不同提交之间对比。
+
+用法（在项目根目录执行）：
+    python -m benchmarks.hot_routes --users 20 --subjects 8 --sessions 2000 --output bench_hot_routes.json
+"""
+import argparse
+import datetime
+import json
+import os
+import time
+from multiprocessing import Pool
+from benchmarks.common import make_config, temp_db_path, summarize, write_report, start_server, HttpClient
+
+
+def _query_strings():
+    today = datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        'today': f"?start_date_utc={today.isoformat()}Z&end_date_utc={(today + datetime.timedelta(days=1)).isoformat()}Z",
+        'range': f"?start_date={(today - datetime.timedelta(days=30)):%Y-%m-%d}&end_date={today:%Y-%m-%d}",
+        'all': '',
+    }
+
+
+def read_scenarios():
+    qs = _query_strings()
+    return [
+        ('index', '/'),
+        ('get_study_data_today', '/get_study_data' + qs['today']),
+        ('get_study_data_range', '/get_study_data' + qs['range']),
+        ('get_study_data_all', '/get_study_data' + qs['all']),
+    ]
+
+
+def session_cycle(call, subject_id):
+    """一次完整的 开始 → 暂停 → 继续 → 结束 流程，产出 (场景名, 耗时)。"""
+    for name, path, body in (
+        ('start_session', '/start_session', {'subject_id': subject_id}),
+        ('toggle_pause_session', '/toggle_pause_session', None),
+        ('toggle_pause_session', '/toggle_pause_session', None),
+        ('stop_session', '/stop_session', None),
+    ):
+        started = time.perf_counter()
+        status = call('POST', path, body)
+        yield name, time.perf_counter() - started, status
+
+
+# --- 进程内：Flask 测试客户端 ---
+def run_test_client(app, usernames, password, iterations):
+    latencies = {}
+    for username in usernames:
+        client = app.test_client()
+        client.post('/login', data={'username': username, 'password': password})
+        subject_id = client.get('/subjects').get_json()[0]['id']
+
+        def call(method, path, body):
+            return client.open(path, method=method, json=body).status_code
+
+        for _ in range(iterations):
+            for name, path in read_scenarios():
+                started = time.perf_counter()
+                client.get(path)
+                latencies.setdefault(name, []).append(time.perf_counter() - started)
+            for name, seconds, _ in session_cycle(call, subject_id):
+                latencies.setdefault(name, []).append(seconds)
+    return {name: summarize(values) for name, values in latencies.items()}
+
+
+# --- 多进程 HTTP 负载 ---
+def _load_worker(args):
+    base_url, username, password, duration = args
+    client = HttpClient(base_url)
+    client.login(username, password)
+    subject_id = json.loads(client.request('GET', '/subjects')[1])[0]['id']
+
+    def call(method, path, body):
+        return client.request(method, path, json_body=body)[0]
+
+    latencies, errors = {}, 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for name, path in read_scenarios():
+            started = time.perf_counter()
+            status, _ = client.request('GET', path)
+            latencies.setdefault(name, []).append(time.perf_counter() - started)
+            errors += status >= 400
+        for name, seconds, status in session_cycle(call, subject_id):
+            latencies.setdefault(name, []).append(seconds)
+            errors += status >= 400
+    return latencies, errors
+
+
+def run_http_load(config_class, usernames, password, processes, duration, port):
+    server = start_server(config_class, port)
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        # 每个进程使用不同的用户，避免会话状态互相干扰
+        jobs = [(base_url, usernames[i % len(usernames)], password, duration) for i in range(processes)]
+        started = time.perf_counter()
+        with Pool(processes) as pool:
+            outputs = pool.map(_load_worker, jobs)
+        wall = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.join()
+
+    merged, errors = {}, 0
+    for latencies, worker_errors in outputs:
+        errors += worker_errors
+        for name, values in latencies.items():
+            merged.setdefault(name, []).extend(values)
+    results = {name: summarize(values, wall) for name, values in merged.items()}
+    results['_total'] = summarize([v for values in merged.values() for v in values], wall)
+    results['_total']['errors'] = errors
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--sessions', type=int, default=2000, help='每个用户的会话数')
+    parser.add_argument('--iterations', type=int, default=20, help='测试客户端阶段每个用户的循环次数')
+    parser.add_argument('--processes', type=int, default=4, help='HTTP 负载生成进程数')
+    parser.add_argument('--duration', type=float, default=10.0, help='HTTP 负载持续秒数')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--skip-http', action='store_true', help='只运行测试客户端阶段')
+    parser.add_argument('--output', default='bench_hot_routes.json')
+    args = parser.parse_args()
+
+    from project import create_app, db
+    from tests.seed import seed_synthetic_data, SEED_PASSWORD
+
+    db_path = temp_db_path()
+    config_class = make_config(db_path)
+    try:
+        app = create_app(config_class)
+        with app.app_context():
+            started = time.perf_counter()
+            usernames = seed_synthetic_data(args.users, args.subjects, args.sessions)
+            seed_seconds = time.perf_counter() - started
+
+        results = {'test_client': run_test_client(app, usernames, SEED_PASSWORD, args.iterations)}
+        if not args.skip_http:
+            results['http'] = run_http_load(config_class, usernames, SEED_PASSWORD, args.processes, args.duration, args.port)
+    finally:
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    params['seed_seconds'] = round(seed_seconds, 3)
+    write_report(args.output, 'hot_routes', params, results)
+    for phase, scenarios in results.items():
+        print(f'[{phase}]')
+        for name, stats in scenarios.items():
+            print(f"  {name:<24} n={stats['count']:<6} rps={stats['rps']:<8} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+    print(f'结果已写入 {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""集中登录时的吞吐量与对其他路由的影响。
+
+在临时 SQLite 文件上生成用户后，对每种哈希模式（PASSWORD_HASH_WORKERS=0 表示在请求线程内计算，
+大于 0 表示交给进程池）分别启动一个 HTTP 服务，然后：
+  * 多个进程不断用新的 cookie 登录（每次都会计算一次密码哈希）；
+  * 同时一个探测进程以已登录身份反复请求 /subjects，衡量其他路由是否被拖慢。
+输出各模式下的登录吞吐量、延迟、被拒绝（503）的次数，以及探测请求的延迟。
+
+用法（在项目根目录执行）：
+    python -m benchmarks.login_burst --processes 8 --duration 10 --workers 0 2 --output bench_login_burst.json
+"""
+import argparse
+import os
+import time
+from multiprocessing import Pool
+from benchmarks.common import make_config, temp_db_path, summarize, write_report, start_server, HttpClient
+
+
+def _login_worker(args):
+    role, base_url, username, password, duration = args
+    latencies, statuses = [], {}
+    if role == 'probe':
+        client = HttpClient(base_url)
+        client.login(username, password)
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        if role == 'probe':
+            status, _ = client.request('GET', '/subjects')
+        else:
+            # 每次使用新的 cookie，确保每次登录都要校验密码
+            status, _ = HttpClient(base_url).login(username, password)
+        latencies.append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+    return role, latencies, statuses
+
+
+def run_mode(db_path, usernames, password, workers, args):
+    config_class = make_config(db_path, PASSWORD_HASH_WORKERS=workers)
+    server = start_server(config_class, args.port)
+    try:
+        base_url = f'http://127.0.0.1:{args.port}'
+        jobs = [('login', base_url, usernames[i % len(usernames)], password, args.duration) for i in range(args.processes)]
+        jobs.append(('probe', base_url, usernames[0], password, args.duration))
+        started = time.perf_counter()
+        with Pool(len(jobs)) as pool:
+            outputs = pool.map(_login_worker, jobs)
+        wall = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.join()
+
+    results = {}
+    for role in ('login', 'probe'):
+        results[role] = summarize([v for r, values, _ in outputs if r == role for v in values], wall)
+        statuses = {}
+        for r, _, counts in outputs:
+            if r == role:
+                for status, count in counts.items():
+                    statuses[str(status)] = statuses.get(str(status), 0) + count
+        results[role]['statuses'] = statuses
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--processes', type=int, default=8, help='并发登录的进程数')
+    parser.add_argument('--duration', type=float, default=10.0, help='每种模式的持续秒数')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2], help='要对比的哈希进程池大小')
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--output', default='bench_login_burst.json')
+    args = parser.parse_args()
+
+    from project import create_app
+    from tests.seed import seed_synthetic_data, SEED_PASSWORD
+
+    db_path = temp_db_path()
+    try:
+        app = create_app(make_config(db_path))
+        with app.app_context():
+            usernames = seed_synthetic_data(args.users, 2, 10)
+        results = {f'workers={w}': run_mode(db_path, usernames, SEED_PASSWORD, w, args) for w in args.workers}
+    finally:
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    write_report(args.output, 'login_burst', params, results)
+    for mode, roles in results.items():
+        print(f'[{mode}]')
+        for role, stats in roles.items():
+            print(f"  {role:<6} rps={stats['rps']:<8} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                  f"p99={stats['p99_ms']}ms statuses={stats['statuses']}")
+    print(f'结果已写入 {args.output}')
+
+
+if __name__ == '__main__':
+    main()
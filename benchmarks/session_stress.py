@@ -0,0 +1,125 @@
+"""会话状态转换的并发压力测试。
+
+多个线程同时通过 Flask 测试客户端调用 start_session / toggle_pause_session / stop_session，
+模拟多个 worker 或多个标签页的“双击”。时钟被替换为按阶段推进的假时钟：同一阶段内所有请求看到
+相同的时间，阶段之间前进 PHASE_SECONDS 秒。每个阶段结束后记录会话状态，从而可以精确算出
+每个会话应累计的秒数，并断言：
+  * 任何时刻每个用户最多只有一个进行中的会话；
+  * 每个会话的 accumulated_seconds 与按阶段推算的值完全相等（没有丢失也没有重复累加）；
+  * 按日汇总表与原始记录一致；
+  * 每个请求都返回预期的状态码（成功，或冲突时的 400/404），没有 500 等异常响应。
+失败时以非零状态退出。
+
+用法（在项目根目录执行）：
+    python -m benchmarks.session_stress --threads 16 --phases 200
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import make_config, temp_db_path
+
+PHASE_SECONDS = 10
+# 成功（200/201），以及并发冲突时的预期拒绝：已有进行中的会话（400）、没有可暂停/结束的会话（404）
+EXPECTED_STATUSES = {200, 201, 400, 404}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--phases', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from project import create_app, db, session_state
+    from project.models import StudySession, OPEN_SESSION_STATUSES
+    from tests.seed import seed_synthetic_data, SEED_PASSWORD
+    from project.rollup import diff_rollup
+
+    clock = {'now': datetime.datetime(2030, 1, 1, 8, 0)}
+    session_state.utcnow = lambda: clock['now']
+
+    db_path = temp_db_path()
+    app = create_app(make_config(db_path))
+    failures = []
+    try:
+        with app.app_context():
+            username = seed_synthetic_data(n_users=1, n_subjects=2, n_sessions=0)[0]
+
+        local = threading.local()
+
+        def client():
+            if not hasattr(local, 'client'):
+                local.client = app.test_client()
+                local.client.post('/login', data={'username': username, 'password': SEED_PASSWORD})
+            return local.client
+
+        rng = random.Random(args.seed)
+        actions = [
+            lambda c: c.post('/start_session', json={'subject_id': 1}),
+            lambda c: c.post('/toggle_pause_session'),
+            lambda c: c.post('/toggle_pause_session', json={'action': 'pause'}),
+            lambda c: c.post('/toggle_pause_session', json={'action': 'resume'}),
+            lambda c: c.post('/stop_session'),
+        ]
+        # 每个会话按阶段推算的应累计秒数：阶段结束时处于 active，则下一阶段计 PHASE_SECONDS 秒
+        expected = {}
+        active_id = None
+
+        with ThreadPoolExecutor(args.threads) as pool:
+            for phase in range(args.phases):
+                batch = [rng.choice(actions) for _ in range(args.threads)]
+                for status in pool.map(lambda action: action(client()).status_code, batch):
+                    if status not in EXPECTED_STATUSES:
+                        failures.append(f'阶段 {phase}: 请求返回了意外的状态码 {status}')
+
+                with app.app_context():
+                    open_sessions = StudySession.query.filter(StudySession.status.in_(OPEN_SESSION_STATUSES)).all()
+                    if len(open_sessions) > 1:
+                        failures.append(f'阶段 {phase}: 同时存在 {len(open_sessions)} 个进行中的会话')
+                    for session in open_sessions:
+                        expected.setdefault(session.id, 0)
+                    if active_id is not None:
+                        # 上一阶段结束时为 active 的会话，在本阶段内经过了 PHASE_SECONDS 秒
+                        expected[active_id] = expected.get(active_id, 0) + PHASE_SECONDS
+                    active = [s for s in open_sessions if s.status == 'active']
+                    active_id = active[0].id if active else None
+                    for session in StudySession.query.filter_by(status='completed'):
+                        expected.setdefault(session.id, 0)
+                clock['now'] += datetime.timedelta(seconds=PHASE_SECONDS)
+
+        status = client().post('/stop_session').status_code
+        if status not in EXPECTED_STATUSES:
+            failures.append(f'最后的 stop_session 返回了意外的状态码 {status}')
+        if active_id is not None:
+            expected[active_id] += PHASE_SECONDS
+
+        with app.app_context():
+            sessions = {s.id: s for s in StudySession.query.all()}
+            for session_id, seconds in sorted(expected.items()):
+                actual = sessions[session_id].accumulated_seconds
+                if actual != seconds:
+                    failures.append(f'会话 {session_id}: 应累计 {seconds}s，实际 {actual}s')
+            mismatches = diff_rollup()
+            if mismatches:
+                failures.append(f'按日汇总表有 {len(mismatches)} 处与原始记录不一致')
+            print(f'{args.phases} 个阶段 × {args.threads} 个线程，共产生 {len(sessions)} 个会话，'
+                  f'累计 {sum(s.accumulated_seconds for s in sessions.values())}s。')
+            db.engine.dispose()
+    finally:
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+    if failures:
+        for failure in failures[:50]:
+            print(f'  [失败] {failure}')
+        print(f'共 {len(failures)} 处失败。')
+        sys.exit(1)
+    print('通过：没有丢失或重复累加的时长，也没有重复的进行中会话。')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""worker 启动耗时：导入时间、创建应用时间和第一个请求的耗时。
+
+每次测量都在新的 Python 进程中进行（模拟 worker 冷启动），对比以下几种方式：
+  * auto_migrate：启动时执行迁移检查（相当于原来 create_app 中的 create_all + upgrade），不使用模板字节码缓存；
+  * explicit_cold：结构已由 flask manage migrate-db 创建，字节码缓存目录为空；
+  * explicit_warm：同上，但字节码缓存已由 flask manage compile-templates 预先生成；
+  * preload_fork：模拟 gunicorn preload_app：父进程导入并创建应用、预加载模板后 fork，只统计 fork 后子进程的第一个请求。
+第一个请求为 GET /login（渲染继承 base.html 的模板，不需要登录）。
+worker_boot 为新 worker 从启动到完成第一个请求的时间：非 preload 方式为 导入 + 创建应用 + 第一个请求，
+preload_fork 为 fork + 第一个请求（导入和创建应用只在 master 中执行一次）。
+
+用法（在项目根目录执行）：
+    python -m benchmarks.startup --runs 10 --output bench_startup.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = {
+    'auto_migrate': {'DB_AUTO_MIGRATE': True, 'JINJA_BYTECODE_CACHE_DIR': None},
+    'explicit_cold': {'DB_AUTO_MIGRATE': False},
+    'explicit_warm': {'DB_AUTO_MIGRATE': False},
+    'preload_fork': {'DB_AUTO_MIGRATE': False, 'TEMPLATE_PRELOAD': True},
+}
+
+
+def _child(db_path, overrides, fork):
+    """在当前（新启动的）进程中测量，结果以一行 JSON 输出。"""
+    started = time.perf_counter()
+    from project import create_app
+    import project.routes  # noqa: F401  导入全部视图与模型
+    imported = time.perf_counter()
+    from benchmarks.common import make_config
+    config_class = make_config(db_path, **overrides)
+    before_create = time.perf_counter()
+    app = create_app(config_class)
+    created = time.perf_counter()
+
+    if fork:
+        read_fd, write_fd = os.pipe()
+        forked = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            status = app.test_client().get('/login').status_code
+            os.write(write_fd, json.dumps([time.perf_counter() - forked, status]).encode())
+            os._exit(0)
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        first_request, status = json.loads(os.read(read_fd, 1024))
+    else:
+        request_started = time.perf_counter()
+        status = app.test_client().get('/login').status_code
+        first_request = time.perf_counter() - request_started
+
+    print(json.dumps({
+        'import_s': imported - started,
+        'create_app_s': created - before_create,
+        'first_request_s': first_request,
+        'worker_boot_s': first_request if fork else (imported - started) + (created - before_create) + first_request,
+        'status': status,
+    }))
+
+
+def _measure(db_path, mode, overrides):
+    started = time.perf_counter()
+    output = subprocess.check_output(
+        [sys.executable, '-m', 'benchmarks.startup', '--child', json.dumps([db_path, overrides, mode == 'preload_fork'])],
+        text=True
+    )
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_s'] = time.perf_counter() - started
+    return result
+
+
+def _summarize(samples):
+    summary = {}
+    for key in ('import_s', 'create_app_s', 'first_request_s', 'worker_boot_s', 'process_s'):
+        values = sorted(sample[key] for sample in samples)
+        summary[key[:-2] + '_ms_median'] = round(values[len(values) // 2] * 1000, 2)
+        summary[key[:-2] + '_ms_min'] = round(values[0] * 1000, 2)
+    summary['statuses'] = sorted({sample['status'] for sample in samples})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='每种方式启动的进程数')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--output', default='bench_startup.json')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(*json.loads(args.child))
+        return
+
+    from project import create_app
+    from project.templating import compile_templates
+    from benchmarks.common import make_config, temp_db_path, write_report
+
+    db_path = temp_db_path()
+    cache_root = tempfile.mkdtemp(prefix='study_tracker_jinja_')
+    results = {}
+    try:
+        # 预先建好数据库结构，相当于部署时执行 flask manage migrate-db
+        create_app(make_config(db_path, JINJA_BYTECODE_CACHE_DIR=None))
+        for mode in args.modes:
+            overrides = dict(MODES[mode])
+            if 'JINJA_BYTECODE_CACHE_DIR' not in overrides:
+                overrides['JINJA_BYTECODE_CACHE_DIR'] = os.path.join(cache_root, mode)
+            samples = []
+            for _ in range(args.runs):
+                cache_dir = overrides['JINJA_BYTECODE_CACHE_DIR']
+                if cache_dir and mode == 'explicit_cold':
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                elif cache_dir and not os.path.isdir(cache_dir):
+                    # 相当于部署时执行 flask manage compile-templates
+                    compile_templates(create_app(make_config(db_path, JINJA_BYTECODE_CACHE_DIR=cache_dir)))
+                samples.append(_measure(db_path, mode, overrides))
+            results[mode] = _summarize(samples)
+    finally:
+        shutil.rmtree(cache_root, ignore_errors=True)
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+    params = {k: v for k, v in vars(args).items() if k not in ('output', 'child')}
+    write_report(args.output, 'startup', params, results)
+    for mode, stats in results.items():
+        print(f"[{mode}] import={stats['import_ms_median']}ms create_app={stats['create_app_ms_median']}ms "
+              f"first_request={stats['first_request_ms_median']}ms worker_boot={stats['worker_boot_ms_median']}ms "
+              f"statuses={stats['statuses']}")
+    print(f'结果已写入 {args.output}')
+
+
+if __name__ == '__main__':
+    main()
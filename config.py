@@ -1,4 +1,5 @@
 import os
+import datetime
 
 # 获取项目根目录的绝对路径
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -10,4 +11,91 @@ class Config:
     # 数据库配置
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'study_tracker.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # 数据库引擎配置档：development 使用 SQLite 默认设置；production 为 SQLite 开启 WAL 等 PRAGMA 并设置连接池
+    # 使用 PostgreSQL（DATABASE_URL=postgresql://...）时两种配置档都会使用下面的连接池参数
+    DB_PROFILE = os.environ.get('DB_PROFILE', 'development')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+    # 数据库结构由 `flask manage migrate-db` 在部署时显式创建和升级；为 True 时 create_app 启动时自动执行（测试、脚本化场景）
+    DB_AUTO_MIGRATE = os.environ.get('DB_AUTO_MIGRATE', '').lower() in ('1', 'true', 'yes')
+
+    # 倒计时默认设置（用户未自定义时使用），有效时段为每天 [开始小时, 结束小时)
+    COUNTDOWN_DEFAULT_TARGET = datetime.datetime(2025, 12, 20, 8, 30)
+    COUNTDOWN_DEFAULT_START_HOUR = 8
+    COUNTDOWN_DEFAULT_END_HOUR = 22
+
+    # 实时事件推送：未设置时使用进程内发布/订阅，多 worker 部署时设置为 redis:// 地址
+    EVENT_BROKER_URL = os.environ.get('EVENT_BROKER_URL')
+    EVENTS_HEARTBEAT_SECONDS = 15
+    EVENTS_POLL_TIMEOUT_SECONDS = 25
+    # SSE 长连接和长轮询会一直占住处理它的 worker，只有异步 worker（gevent/eventlet）下才能开启；
+    # gunicorn.conf.py 按 worker 类型自动设置。关闭时页面每 EVENTS_POLL_INTERVAL_SECONDS 秒普通轮询一次
+    LIVE_UPDATES_ENABLED = os.environ.get('LIVE_UPDATES_ENABLED', '').lower() in ('1', 'true', 'yes')
+    EVENTS_POLL_INTERVAL_SECONDS = 10
+
+    # 用户与科目列表缓存：未设置 CACHE_URL 时为进程内 LRU，多 worker 共享时设置为 redis:// 地址
+    CACHE_URL = os.environ.get('CACHE_URL')
+    CACHE_TTL_SECONDS = 300
+    CACHE_MAX_ENTRIES = 10000
+
+    # 性能监控（可选）：开启后记录各端点耗时与 SQL 数量，并提供 /metrics 端点
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    # 单个请求的 SQL 数超过该值时记录警告日志（疑似 N+1 查询）
+    METRICS_N_PLUS_ONE_THRESHOLD = int(os.environ.get('METRICS_N_PLUS_ONE_THRESHOLD', 20))
+    METRICS_SLOW_QUERY_LIMIT = 20
+    # /metrics 含 SQL 文本：设置后需带 Authorization: Bearer <METRICS_TOKEN> 访问；未设置时只允许本机访问
+    # （经同一台机器上的反向代理转发时来源地址也是本机，此时请务必设置令牌）
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+    # 小于该字节数的 JSON 响应不压缩
+    COMPRESS_MIN_SIZE = 500
+
+    # 密码哈希：写完整的算法与参数，已有哈希与之不同时会在用户下次登录时自动重新计算
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # 哈希进程池大小（每个 gunicorn worker 一个池），0 表示在请求线程内直接计算；gunicorn.conf.py 中默认为 2
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    # 同时等待哈希结果的请求数上限，超过时直接返回 503
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))
+    PASSWORD_HASH_TIMEOUT_SECONDS = 10
+    # 登录限流（0 表示不限制）：窗口内每个 IP、每个用户名的登录失败次数，成功的登录不计入
+    LOGIN_THROTTLE_WINDOW_SECONDS = 300
+    LOGIN_MAX_FAILURES_PER_IP = int(os.environ.get('LOGIN_MAX_FAILURES_PER_IP', 60))
+    LOGIN_MAX_FAILURES_PER_USERNAME = int(os.environ.get('LOGIN_MAX_FAILURES_PER_USERNAME', 10))
+
+    # 定期维护（flask manage run-maintenance，或设置 MAINTENANCE_INTERVAL_SECONDS 在 Web 进程内定期执行，0 表示不启动）
+    MAINTENANCE_INTERVAL_SECONDS = int(os.environ.get('MAINTENANCE_INTERVAL_SECONDS', 0))
+    # 计时超过该小时数的 active 会话视为被遗忘，自动结束且不计入这段时长（0 表示不处理）
+    STALE_SESSION_MAX_HOURS = int(os.environ.get('STALE_SESSION_MAX_HOURS', 12))
+    # 创建超过该月数的已完成会话移入归档表（0 表示不归档），每批移动 ARCHIVE_CHUNK_SIZE 条
+    ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', 24))
+    ARCHIVE_CHUNK_SIZE = 1000
+
+    # Jinja 模板字节码缓存目录，默认不缓存；设置为可写的目录（不要放在只读的代码目录中）后，
+    # `flask manage compile-templates` 在部署时预先编译全部模板。目录无法创建时记录警告并不使用缓存
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR') or None
+    # 为 True 时 create_app 立即加载全部模板；配合 gunicorn preload_app，fork 出的 worker 直接共享已编译的模板
+    TEMPLATE_PRELOAD = os.environ.get('TEMPLATE_PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+    # 静态资源构建（flask manage build-assets）：生成多种宽度的图片版本，并把固定版本的 Chart.js 放入本地
+    ASSET_IMAGES = ['images/background.jpg']
+    ASSET_IMAGE_WIDTHS = [640, 1280, 1920, 2560]
+    CHARTJS_URL = 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js'
+
+
+class TestingConfig(Config):
+    # 用于基准测试、查询计划测试等脚本化场景
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    # 脚本化场景下在进程内直接计算哈希，也不限制同一 IP 的大量登录
+    PASSWORD_HASH_WORKERS = 0
+    LOGIN_MAX_FAILURES_PER_IP = 0
+    # 临时数据库在创建应用时直接建表
+    DB_AUTO_MIGRATE = True
\ No newline at end of file
@@ -0,0 +1,33 @@
+import importlib.util
+import os
+
+# 安装了 gevent（pip install gevent）时默认使用 gevent worker：/events 的 SSE 长连接只占用一个协程，不会独占同步 worker。
+# 未安装时退回同步 worker，此时每个打开的页面都会占住一个 worker。也可以用 GUNICORN_WORKER_CLASS 显式指定。
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent' if importlib.util.find_spec('gevent') else 'sync')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '1000'))
+# SSE 长连接会一直占住同步 worker：只有异步 worker 下才开启实时推送，否则页面退回普通的定时轮询
+os.environ.setdefault('LIVE_UPDATES_ENABLED', '1' if worker_class in ('gevent', 'eventlet') else '0')
+# 进程内事件广播只在单个 worker 内可见；多 worker 时请同时设置 EVENT_BROKER_URL 指向 Redis
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
+
+# 登录/注册的密码哈希交给每个 worker 自己的进程池计算，避免集中登录时占满 worker 的 CPU
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '2')
+
+# 在 master 中导入并创建应用、预编译全部模板后再 fork：worker 启动只剩 fork 的开销，并以写时复制共享这部分内存。
+# 修改代码后需要重启 master（kill -HUP 只会用已加载的代码重建 worker）。设置 GUNICORN_PRELOAD=0 可关闭。
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+if preload_app:
+    os.environ.setdefault('TEMPLATE_PRELOAD', '1')
+    if worker_class == 'gevent':
+        # 应用在 master 中导入，必须在此之前打补丁，否则预先创建的锁、线程等不会被替换为协程版本
+        from gevent import monkey
+        monkey.patch_all()
+
+
+def post_fork(server, worker):
+    # 从 master 继承的连接池不能跨进程使用：丢弃其中的连接（不关闭，以免影响 master），worker 按需重新连接
+    if server.cfg.preload_app:
+        from project import db
+        with server.app.wsgi().app_context():
+            db.engine.dispose(close=False)
@@ -32,17 +32,44 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    from project.engine import configure_engine, init_engine
+    configure_engine(app)
     db.init_app(app)
+    init_engine(app)
     login_manager.init_app(app)
 
+    from project.events import init_broker
+    init_broker(app)
+    from project.cache import init_cache
+    init_cache(app)
+    from project.passwords import init_passwords
+    init_passwords(app)
+
     # 注册自定义过滤器
     app.jinja_env.filters['duration'] = format_duration_filter
 
+    from project.assets import init_assets
+    init_assets(app)
+    from project.compression import init_compression
+    init_compression(app)
+
     from project.routes import bp as routes_bp
     app.register_blueprint(routes_bp)
+    # 在注册蓝图之后，预加载模板时才能列出全部模板
+    from project.templating import init_templates
+    init_templates(app)
+
+    from project.maintenance import init_maintenance
+    init_maintenance(app)
+
+    if app.config['METRICS_ENABLED']:
+        from project.instrumentation import init_instrumentation
+        init_instrumentation(app)
 
-    with app.app_context():
-        from project import models
-        db.create_all()
+    # 不在每次启动时检查数据库结构：部署时执行 `flask manage migrate-db`
+    if app.config['DB_AUTO_MIGRATE']:
+        with app.app_context():
+            from project.migrations import upgrade
+            upgrade()
 
     return app
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""学习趋势统计：连续学习天数、年度热力图、滚动平均、分位数和各科目的周趋势。
+
+一次聚合查询从按日汇总表取出 (日期, 科目, 秒数)，填入 科目 × 天 的 NumPy 矩阵后全部以向量化方式计算，
+不再逐条遍历会话。日期按 UTC 自然日划分，与汇总表口径一致。
+结果按 (用户, 数据版本, 截止日期) 缓存：数据改动后版本号变化，旧条目自然过期。
+"""
+import datetime
+from sqlalchemy import func
+from project import db, cache, dataversion
+from project.models import DailyStudyRollup, Subject
+
+# numpy 在第一次计算时才导入（约 80ms），不计入 worker 的启动时间
+np = None
+
+HEATMAP_DAYS = 53 * 7
+ROLLING_WINDOW = 7
+TREND_WEEKS = 12
+PERCENTILES = (50, 75, 90)
+
+
+def _daily_matrix(user_id, first_day, end_day):
+    """返回 (科目名称数组, 科目 × 天 的秒数矩阵)，矩阵的列覆盖 [first_day, end_day]，早于已有记录的部分补零。"""
+    rows = db.session.query(
+        DailyStudyRollup.day, Subject.name, func.sum(DailyStudyRollup.total_seconds)
+    ).join(Subject, Subject.id == DailyStudyRollup.subject_id).filter(
+        DailyStudyRollup.user_id == user_id,
+        DailyStudyRollup.day <= end_day,
+        DailyStudyRollup.total_seconds > 0
+    ).group_by(DailyStudyRollup.day, Subject.name).all()
+    if rows:
+        first_day = min(first_day, min(day for day, _, _ in rows))
+    n_days = (end_day - first_day).days + 1
+    if not rows:
+        return np.array([], dtype=object), np.zeros((0, n_days)), first_day
+
+    days, names, seconds = zip(*rows)
+    subjects, subject_index = np.unique(np.array(names, dtype=object), return_inverse=True)
+    day_index = np.array([(day - first_day).days for day in days])
+    matrix = np.zeros((len(subjects), n_days))
+    np.add.at(matrix, (subject_index, day_index), np.array(seconds, dtype=float))
+    return subjects, matrix, first_day
+
+
+def _streaks(daily):
+    """返回 (当前连续天数, 最长连续天数)。今天还没有学习时，截至昨天的连续天数仍算作当前连续。"""
+    active = np.concatenate(([0], (daily > 0).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(active))
+    starts, ends = edges[::2], edges[1::2]
+    if not ends.size:
+        return 0, 0
+    lengths = ends - starts
+    current = int(lengths[-1]) if ends[-1] >= len(daily) - 1 else 0
+    return current, int(lengths.max())
+
+
+def _rolling_mean(daily, window):
+    """每天及之前 window - 1 天的平均值（长度与 daily 相同，开头不足的部分按零计算）。"""
+    sums = np.cumsum(np.concatenate((np.zeros(window), daily)))
+    return (sums[window:] - sums[:-window]) / window
+
+
+def _heat_levels(values):
+    """按有学习记录的天数的四分位数把每天分为 0（未学习）到 4 级。"""
+    active = values[values > 0]
+    if not active.size:
+        return np.zeros(len(values), dtype=int)
+    thresholds = np.percentile(active, [25, 50, 75])
+    return np.where(values > 0, np.minimum(np.searchsorted(thresholds, values, side='right') + 1, 4), 0)
+
+
+def _subject_trends(subjects, matrix):
+    """最近 TREND_WEEKS 周每个科目的周总时长，以及用最小二乘拟合的每周变化量（秒/周）。"""
+    weekly = matrix[:, -TREND_WEEKS * 7:].reshape(len(subjects), TREND_WEEKS, 7).sum(axis=2)
+    x = np.arange(TREND_WEEKS) - (TREND_WEEKS - 1) / 2
+    slopes = (weekly - weekly.mean(axis=1, keepdims=True)) @ x / (x @ x)
+    totals = weekly.sum(axis=1)
+    return [
+        {'subject': subjects[i], 'weekly_seconds': [round(v) for v in weekly[i]],
+         'total_seconds': round(totals[i]), 'slope_seconds_per_week': round(slopes[i])}
+        for i in np.argsort(-totals, kind='stable') if totals[i] > 0
+    ]
+
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError('学习趋势统计需要安装 numpy 包')
+        np = numpy
+
+
+def compute_summary(user_id, end_day):
+    _require_numpy()
+    # 至少覆盖热力图、滚动窗口和周趋势所需的天数
+    span = max(HEATMAP_DAYS + ROLLING_WINDOW, TREND_WEEKS * 7)
+    subjects, matrix, first_day = _daily_matrix(user_id, end_day - datetime.timedelta(days=span - 1), end_day)
+    daily = matrix.sum(axis=0)
+    active = daily[daily > 0]
+    current_streak, longest_streak = _streaks(daily)
+    heatmap = daily[-HEATMAP_DAYS:]
+
+    return {
+        'end_date': end_day.isoformat(),
+        'total_seconds': round(daily.sum()),
+        'active_days': int(active.size),
+        'streaks': {'current': current_streak, 'longest': longest_streak},
+        'percentiles': {
+            f'p{p}': round(v) for p, v in zip(PERCENTILES, np.percentile(active, PERCENTILES) if active.size else [0] * len(PERCENTILES))
+        },
+        'heatmap': {
+            'start_date': (end_day - datetime.timedelta(days=HEATMAP_DAYS - 1)).isoformat(),
+            'seconds': [round(v) for v in heatmap],
+            'levels': _heat_levels(heatmap).tolist(),
+        },
+        'rolling': {
+            'window': ROLLING_WINDOW,
+            'seconds': [round(v) for v in _rolling_mean(daily, ROLLING_WINDOW)[-HEATMAP_DAYS:]],
+        },
+        'subjects': _subject_trends(subjects, matrix),
+    }
+
+
+def summary(user_id, end_day):
+    """带缓存的 compute_summary；numpy 未安装时抛出 RuntimeError。"""
+    key = cache.analytics_key(user_id, dataversion.current(user_id), end_day)
+    result = cache.get(key)
+    if result is None:
+        result = compute_summary(user_id, end_day)
+        cache.set(key, result)
+    return result
@@ -0,0 +1,185 @@
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import shutil
+from flask import request, send_from_directory, url_for
+
+# 构建产物目录（相对 static 目录）；其中的文件名带内容指纹，可以永久缓存
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# 只为文本类资源生成预压缩副本，图片本身已经压缩过
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.svg', '.json', '.map')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# (srcset 中的 type, Pillow 格式名, 扩展名, 保存参数)，按浏览器优先尝试的顺序排列
+IMAGE_FORMATS = (
+    ('image/avif', 'AVIF', '.avif', {'quality': 50, 'speed': 6}),
+    ('image/webp', 'WEBP', '.webp', {'quality': 72, 'method': 6}),
+    ('image/jpeg', 'JPEG', '.jpg', {'quality': 78, 'optimize': True, 'progressive': True}),
+)
+
+
+def _fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def _precompress(path, data):
+    # mtime=0 让相同内容得到相同的 .gz，便于比较构建结果
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        return
+    with open(path + '.br', 'wb') as f:
+        f.write(brotli.compress(data, quality=11))
+
+
+def _write_fingerprinted(static_folder, logical_path, data):
+    """把内容写入 dist/ 下带指纹的文件名，返回相对 static 目录的路径。"""
+    root, ext = os.path.splitext(logical_path)
+    relative = f'{DIST_DIR}/{root}.{_fingerprint(data)}{ext}'
+    path = os.path.join(static_folder, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if ext in COMPRESSIBLE_EXTENSIONS:
+        _precompress(path, data)
+    return relative
+
+
+def _supported_image_formats():
+    from PIL import features
+    try:
+        # 旧版 Pillow 需要 pillow-avif-plugin 才能编码 AVIF
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+    return [fmt for fmt in IMAGE_FORMATS if fmt[1] == 'JPEG' or features.check(fmt[1].lower())]
+
+
+def build_image(static_folder, logical_path, widths):
+    """生成多种宽度的 AVIF/WebP/JPEG 版本，返回 {MIME 类型: [(路径, 宽度), ...]}。"""
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise RuntimeError('生成图片版本需要安装 Pillow 包')
+    formats = _supported_image_formats()
+    root, _ = os.path.splitext(logical_path)
+    variants = {mime: [] for mime, _, _, _ in formats}
+    with Image.open(os.path.join(static_folder, logical_path)) as source:
+        image = ImageOps.exif_transpose(source).convert('RGB')
+    for width in sorted({min(w, image.width) for w in widths}):
+        resized = image if width == image.width else image.resize(
+            (width, round(image.height * width / image.width)), Image.LANCZOS)
+        for mime, pil_format, ext, options in formats:
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            variants[mime].append((_write_fingerprinted(static_folder, f'{root}-{width}{ext}', buffer.getvalue()), width))
+    return variants
+
+
+def vendor_script(static_folder, logical_path, url, source=None):
+    """确保第三方脚本已放入 static 目录：优先使用 source 指定的本地文件，否则从 url 下载一次。"""
+    path = os.path.join(static_folder, logical_path)
+    if source is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(source, path)
+    elif not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        import urllib.request
+        with urllib.request.urlopen(url, timeout=30) as response, open(path, 'wb') as f:
+            shutil.copyfileobj(response, f)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def build_assets(static_folder, images, widths, scripts):
+    """重新生成 dist/ 目录和资源清单。scripts 为 {static 内的路径: (下载地址, 本地来源或 None)}。
+
+    返回 (清单, [(资源, 原始字节数, 首次加载的最大字节数)])。
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    if os.path.isdir(dist):
+        shutil.rmtree(dist)
+    manifest = {'files': {}, 'images': {}}
+    report = []
+
+    for logical_path, (url, source) in scripts.items():
+        data = vendor_script(static_folder, logical_path, url, source)
+        relative = _write_fingerprinted(static_folder, logical_path, data)
+        manifest['files'][logical_path] = relative
+        compressed = [os.path.join(static_folder, relative + suffix) for suffix in ('.br', '.gz')]
+        report.append((logical_path, len(data), min(os.path.getsize(p) for p in compressed if os.path.exists(p))))
+
+    for logical_path in images:
+        variants = build_image(static_folder, logical_path, widths)
+        manifest['images'][logical_path] = variants
+        largest = max(os.path.getsize(os.path.join(static_folder, p)) for p, _ in next(iter(variants.values())))
+        report.append((logical_path, os.path.getsize(os.path.join(static_folder, logical_path)), largest))
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest, report
+
+
+# --- 运行时：模板辅助函数与静态文件响应 ---
+def load_manifest(static_folder):
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'files': {}, 'images': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def init_assets(app):
+    """注册模板中使用的 asset_url / image_sources，并让 dist/ 下的文件使用预压缩副本和长期缓存。
+
+    资源清单在启动时读取一次，执行 flask manage build-assets 后需要重启应用。
+    """
+    manifest = load_manifest(app.static_folder)
+
+    def asset_url(path, fallback=None):
+        """优先返回带指纹的构建产物；未构建且本地也没有该文件时返回 fallback（如 CDN 地址）。"""
+        if path in manifest['files']:
+            return url_for('static', filename=manifest['files'][path])
+        if fallback is not None and not os.path.exists(os.path.join(app.static_folder, path)):
+            return fallback
+        return url_for('static', filename=path)
+
+    def image_sources(path):
+        """返回 <picture> 所需的 ([(MIME 类型, srcset), ...], 回退 src)；未构建时只有原图。"""
+        variants = manifest['images'].get(path)
+        if not variants:
+            return [], url_for('static', filename=path)
+        sources = [
+            (mime, ', '.join(f"{url_for('static', filename=p)} {width}w" for p, width in items))
+            for mime, items in variants.items()
+        ]
+        # 回退 src 使用宽度适中的 JPEG，而不是原图
+        jpeg = variants['image/jpeg']
+        fallback = next((p for p, width in jpeg if width >= 1920), jpeg[-1][0])
+        return sources, url_for('static', filename=fallback)
+
+    app.jinja_env.globals.update(asset_url=asset_url, image_sources=image_sources)
+
+    def static(filename):
+        immutable = filename.startswith(DIST_DIR + '/')
+        response = None
+        if immutable:
+            for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+                if request.accept_encodings[encoding] and os.path.isfile(os.path.join(app.static_folder, filename + suffix)):
+                    response = send_from_directory(app.static_folder, filename + suffix,
+                                                   mimetype=mimetypes.guess_type(filename)[0])
+                    response.headers['Content-Encoding'] = encoding
+                    break
+        if response is None:
+            response = app.send_static_file(filename)
+        if immutable:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+            response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = static
@@ -0,0 +1,167 @@
+"""学习记录的批量编辑：一个请求中的多个操作在同一个事务里执行，每个操作都是一条限定在当前用户的
+集合式 DELETE/UPDATE，不再逐条加载 ORM 对象。
+
+支持的操作（operations 数组中的元素）：
+  {"op": "delete", "session_ids": [...], "archived_ids": [...]}  # 两者至少提供一个，archived_ids 为已归档会话的ID
+  {"op": "delete", "start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD"}  # 也接受 start_date_utc/end_date_utc
+  {"op": "set_duration", "session_ids": [...], "duration_seconds": 3600}  # 不能包含正在计时的会话
+  {"op": "reassign", "session_ids": [...], "subject_id": 2}
+按日期范围删除同时作用于已归档的会话（及其区间）；归档会话是只读的，修改时长和科目只针对在用会话。
+任何一个操作校验失败时整批都不执行；所有操作执行完毕后，受影响的按日汇总行集中重新计算一次。
+"""
+import datetime
+import functools
+from sqlalchemy import select, update, delete, func, bindparam
+from project import db, dataversion, dateranges, segments
+from project.models import StudySession, ArchivedStudySession, Subject
+from project.rollup import refresh_rollup_window
+
+MAX_OPERATIONS = 100
+MAX_SESSION_IDS = 5000
+
+
+class BatchError(Exception):
+    def __init__(self, message, results):
+        super().__init__(message)
+        self.message = message
+        self.results = results
+
+
+def _session_ids(op, key='session_ids'):
+    ids = op.get(key)
+    if not isinstance(ids, list) or not ids:
+        raise ValueError(f'{key} 必须是非空数组')
+    if len(ids) > MAX_SESSION_IDS:
+        raise ValueError(f'单个操作最多包含 {MAX_SESSION_IDS} 条记录')
+    try:
+        return sorted({int(i) for i in ids})
+    except (ValueError, TypeError):
+        raise ValueError(f'{key} 中包含无效的ID')
+
+
+def _scope(model, user_id, ids=None, archived_ids=None, start=None, end=None):
+    """操作的会话范围在指定的表（在用会话或归档会话）上对应的条件。
+    按ID指定时，ids 只匹配在用会话、archived_ids 只匹配归档会话。"""
+    conditions = [model.user_id == user_id]
+    if start is None:
+        conditions.append(model.id.in_((archived_ids if model is ArchivedStudySession else ids) or []))
+    else:
+        conditions += [model.creation_time >= start, model.creation_time < end]
+    return conditions
+
+
+def _validate(user_id, op):
+    """校验单个操作并返回 (操作名, 由会话表得到范围条件的函数, 参数)，不合法时抛出 ValueError。"""
+    if not isinstance(op, dict):
+        raise ValueError('操作必须是对象')
+    name = op.get('op')
+    if name == 'delete' and ('session_ids' in op or 'archived_ids' in op):
+        ids = _session_ids(op) if 'session_ids' in op else []
+        archived_ids = _session_ids(op, 'archived_ids') if 'archived_ids' in op else []
+        return name, functools.partial(_scope, user_id=user_id, ids=ids, archived_ids=archived_ids), {'ids': ids + archived_ids}
+    if name == 'delete':
+        start, end, _ = dateranges.parse_date_range(op)
+        if start is None or end is None:
+            raise ValueError('删除需要提供 session_ids、archived_ids 或日期范围')
+        return name, functools.partial(_scope, user_id=user_id, start=start, end=end), None
+    if name not in ('delete', 'set_duration', 'reassign'):
+        raise ValueError(f'不支持的操作: {name}')
+    ids = _session_ids(op)
+    scope = functools.partial(_scope, user_id=user_id, ids=ids)
+    if name == 'set_duration':
+        try:
+            seconds = int(op.get('duration_seconds'))
+        except (ValueError, TypeError):
+            raise ValueError('无效的时长格式')
+        if seconds < 0:
+            raise ValueError('时长不能为负数')
+        # 正在计时的会话有一段未结束的区间，直接改写时长会让区间与状态不一致
+        if db.session.query(StudySession.id).filter(*scope(StudySession), StudySession.status == 'active').first() is not None:
+            raise ValueError('正在计时的会话不能修改时长，请先暂停或结束')
+        return name, scope, {'ids': ids, 'seconds': seconds}
+    if name == 'reassign':
+        try:
+            subject_id = int(op.get('subject_id'))
+        except (ValueError, TypeError):
+            raise ValueError('选择的科目无效')
+        if db.session.query(Subject.id).filter_by(id=subject_id, user_id=user_id).scalar() is None:
+            raise ValueError('选择的科目无效')
+        return name, scope, {'ids': ids, 'subject_id': subject_id}
+    return name, scope, {'ids': ids}
+
+
+def apply(user_id, operations):
+    """执行一批操作并提交，返回每个操作的结果列表；任一操作不合法时抛出 BatchError 且不做任何修改。"""
+    if not isinstance(operations, list) or not operations:
+        raise BatchError('operations 必须是非空数组', [])
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError(f'每批最多 {MAX_OPERATIONS} 个操作', [])
+
+    validated, results = [], []
+    for index, op in enumerate(operations):
+        try:
+            validated.append(_validate(user_id, op))
+            results.append({'index': index, 'op': op.get('op'), 'status': 'ok'})
+        except ValueError as e:
+            results.append({'index': index, 'op': op.get('op') if isinstance(op, dict) else None, 'status': 'error', 'error': str(e)})
+    if any(r['status'] == 'error' for r in results):
+        raise BatchError('部分操作不合法，未做任何修改', results)
+
+    # 汇总表需要重新计算的范围：所有受影响会话的旧科目、新科目以及日期跨度
+    subject_ids, first_day, last_day = set(), None, None
+
+    def touch(model, conditions):
+        nonlocal first_day, last_day
+        for subject_id, first, last in db.session.query(
+            model.subject_id, func.min(model.creation_time), func.max(model.creation_time)
+        ).filter(*conditions).group_by(model.subject_id):
+            subject_ids.add(subject_id)
+            first_day = min(first_day, first.date()) if first_day else first.date()
+            last_day = max(last_day, last.date()) if last_day else last.date()
+
+    for (name, scope_of, params), result in zip(validated, results):
+        scope = scope_of(StudySession)
+        touch(StudySession, scope)
+        if name == 'delete':
+            archived = scope_of(ArchivedStudySession)
+            touch(ArchivedStudySession, archived)
+            segments.delete_segments(scope)
+            segments.delete_segments(archived, archived=True)
+            affected = sum(
+                db.session.execute(delete(model).where(*conditions), execution_options={'synchronize_session': False}).rowcount
+                for model, conditions in ((StudySession, scope), (ArchivedStudySession, archived))
+            )
+        elif name == 'reassign':
+            affected = db.session.execute(
+                update(StudySession).where(*scope).values(subject_id=params['subject_id']),
+                execution_options={'synchronize_session': False}
+            ).rowcount
+            if affected:
+                subject_ids.add(params['subject_id'])
+        else:
+            # end_time 依赖各自的 creation_time，没有跨数据库的日期加法，先读出再用一次 executemany 写回
+            # 校验之后才开始计时的会话同样跳过，计入 missing
+            rows = db.session.execute(
+                select(StudySession.id, StudySession.creation_time).where(*scope, StudySession.status != 'active')
+            ).all()
+            if rows:
+                db.session.connection().execute(
+                    update(StudySession.__table__).where(StudySession.__table__.c.id == bindparam('row_id')).values(
+                        accumulated_seconds=params['seconds'], end_time=bindparam('new_end_time'), auto_closed=False),
+                    [{'row_id': row_id, 'new_end_time': created + datetime.timedelta(seconds=params['seconds'])}
+                     for row_id, created in rows]
+                )
+                # 手动设置时长后原有区间不再可信，替换为从创建时间开始的一段
+                segments.replace_segments([row_id for row_id, _ in rows], [
+                    (row_id, user_id, created, created + datetime.timedelta(seconds=params['seconds'])) for row_id, created in rows
+                ])
+            affected = len(rows)
+        result['affected'] = affected
+        if params is not None:
+            result['missing'] = len(params['ids']) - affected
+
+    if first_day is not None:
+        refresh_rollup_window(user_id, subject_ids, first_day, last_day)
+    dataversion.bump(user_id)
+    db.session.commit()
+    return results
@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """进程内的 LRU + TTL 缓存，只对当前 worker 可见。"""
+
+    def __init__(self, max_entries=10000, ttl=300):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, record=True):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += record
+                return None
+            self._data.move_to_end(key)
+            self.hits += record
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def incr(self, key, ttl):
+        """计数器加一并返回新值；键不存在或已过期时从 1 开始，ttl 秒后过期（不计入命中统计）。"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                entry = (time.monotonic() + ttl, 0)
+            self._data[key] = (entry[0], entry[1] + 1)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return entry[1] + 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {'backend': 'memory', 'hits': self.hits, 'misses': self.misses, 'entries': len(self._data)}
+
+
+class RedisCache:
+    """Redis（或任何兼容 Redis 协议的本地服务）后端，多个 gunicorn worker 共享缓存和命中计数。"""
+
+    PREFIX = 'study_tracker:cache:'
+
+    def __init__(self, url, ttl=300):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('使用 RedisCache 需要安装 redis 包')
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+
+    def get(self, key, record=True):
+        raw = self._redis.get(self.PREFIX + key)
+        if record:
+            self._redis.incr(self.PREFIX + ('_hits' if raw is not None else '_misses'))
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self._redis.set(self.PREFIX + key, json.dumps(value), ex=self.ttl)
+
+    def incr(self, key, ttl):
+        pipe = self._redis.pipeline()
+        # 只在键不存在时创建并设置过期时间（固定窗口），再原子地加一
+        pipe.set(self.PREFIX + key, 0, ex=ttl, nx=True)
+        pipe.incr(self.PREFIX + key)
+        return pipe.execute()[1]
+
+    def delete(self, *keys):
+        if keys:
+            self._redis.delete(*(self.PREFIX + key for key in keys))
+
+    def clear(self):
+        keys = list(self._redis.scan_iter(self.PREFIX + '*'))
+        if keys:
+            self._redis.delete(*keys)
+
+    def stats(self):
+        hits, misses = self._redis.mget(self.PREFIX + '_hits', self.PREFIX + '_misses')
+        return {'backend': 'redis', 'hits': int(hits or 0), 'misses': int(misses or 0)}
+
+
+backend = None
+
+
+def init_cache(app):
+    global backend
+    url = app.config.get('CACHE_URL')
+    ttl = app.config['CACHE_TTL_SECONDS']
+    backend = RedisCache(url, ttl) if url else LRUCache(app.config['CACHE_MAX_ENTRIES'], ttl)
+
+
+def get(key, record=True):
+    """读取缓存；record=False 时不计入命中统计（用于读取计数器等并非缓存查询的场合）。"""
+    return backend.get(key, record)
+
+
+def set(key, value):
+    backend.set(key, value)
+
+
+def incr(key, ttl):
+    return backend.incr(key, ttl)
+
+
+def delete(*keys):
+    backend.delete(*keys)
+
+
+def stats():
+    stats = backend.stats()
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 4) if total else None
+    return stats
+
+
+# --- 缓存键与失效 ---
+def user_key(user_id):
+    return f'user:{user_id}'
+
+
+def subjects_key(user_id):
+    return f'subjects:{user_id}'
+
+
+def analytics_key(user_id, data_version, end_day):
+    # 版本号写在键里，数据改动后不需要主动失效
+    return f'analytics:{user_id}:{data_version}:{end_day.isoformat()}'
+
+
+def invalidate_user(user_id):
+    backend.delete(user_key(user_id))
+
+
+def invalidate_subjects(user_id):
+    backend.delete(subjects_key(user_id))
+
+
+def clear():
+    backend.clear()
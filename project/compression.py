@@ -0,0 +1,36 @@
+import gzip
+from flask import request
+
+COMPRESSIBLE_MIMETYPES = ('application/json',)
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def init_compression(app):
+    """按 Accept-Encoding 用 brotli（已安装时）或 gzip 压缩 JSON 响应体；流式响应和静态文件不处理。"""
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    brotli = _brotli()
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers):
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        if brotli is not None and request.accept_encodings['br']:
+            # 动态内容用中等压缩级别，压缩率接近最高级别而耗时少得多
+            response.set_data(brotli.compress(data, quality=5))
+            response.headers['Content-Encoding'] = 'br'
+        elif request.accept_encodings['gzip']:
+            response.set_data(gzip.compress(data, compresslevel=6))
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
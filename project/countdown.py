@@ -0,0 +1,65 @@
+import datetime
+from functools import lru_cache
+
+
+def _window_overlap(day, start, end, effective_start_hour, effective_end_hour):
+    """[start, end) 与 day 当天有效时段的重叠秒数。"""
+    midnight = datetime.datetime.combine(day, datetime.time())
+    window_start = midnight + datetime.timedelta(hours=effective_start_hour)
+    window_end = midnight + datetime.timedelta(hours=effective_end_hour)
+    return max(0.0, (min(end, window_end) - max(start, window_start)).total_seconds())
+
+
+def effective_seconds_between(now, target_datetime, effective_start_hour, effective_end_hour):
+    """以 O(1) 计算 now 到 target_datetime 之间落在每日有效时段内的总秒数。
+
+    只有首尾两天需要裁剪，中间的整天直接按 天数 × 每日有效时长 计算。
+    """
+    if now >= target_datetime:
+        return 0.0
+    first_day, last_day = now.date(), target_datetime.date()
+    if first_day == last_day:
+        return _window_overlap(first_day, now, target_datetime, effective_start_hour, effective_end_hour)
+
+    seconds_in_effective_day = (effective_end_hour - effective_start_hour) * 3600
+    whole_days = (last_day - first_day).days - 1
+    return (
+        _window_overlap(first_day, now, target_datetime, effective_start_hour, effective_end_hour)
+        + whole_days * seconds_in_effective_day
+        + _window_overlap(last_day, now, target_datetime, effective_start_hour, effective_end_hour)
+    )
+
+
+@lru_cache(maxsize=1024)
+def _effective_seconds_at_minute(minute, target_datetime, effective_start_hour, effective_end_hour):
+    return effective_seconds_between(minute, target_datetime, effective_start_hour, effective_end_hour)
+
+
+def effective_seconds_remaining(now, target_datetime, effective_start_hour, effective_end_hour):
+    """按分钟缓存的 effective_seconds_between。
+
+    有效时段以整点划分、目标时间精确到分钟，因此同一分钟内要么全部处于有效时段内、要么全部不在，
+    只需在该分钟起点的缓存结果上扣除已流逝的秒数即可得到精确值。
+    """
+    minute = now.replace(second=0, microsecond=0)
+    remaining = _effective_seconds_at_minute(minute, target_datetime, effective_start_hour, effective_end_hour)
+    if minute < target_datetime and _window_overlap(minute.date(), minute, minute + datetime.timedelta(minutes=1), effective_start_hour, effective_end_hour):
+        remaining -= (now - minute).total_seconds()
+    return max(0.0, remaining)
+
+
+def calculate_and_format_time(target_datetime, effective_start_hour, effective_end_hour, now=None):
+    now = now or datetime.datetime.now()
+    if now >= target_datetime: return 0, 0, '00', '00', '00', '0.0'
+    total_effective_seconds = effective_seconds_remaining(now, target_datetime, effective_start_hour, effective_end_hour)
+    seconds_in_effective_day = (effective_end_hour - effective_start_hour) * 3600
+    days = int(total_effective_seconds // seconds_in_effective_day)
+    remaining_seconds_after_days = total_effective_seconds % seconds_in_effective_day
+    hours = int(remaining_seconds_after_days // 3600)
+    remaining_seconds_after_hours = remaining_seconds_after_days % 3600
+    minutes = int(remaining_seconds_after_hours // 60)
+    seconds = int(remaining_seconds_after_hours % 60)
+    formatted_hours = str(hours).zfill(2); formatted_minutes = str(minutes).zfill(2); formatted_seconds = str(seconds).zfill(2)
+    total_effective_hours = total_effective_seconds / 3600
+    formatted_total_hours = f"{total_effective_hours:,.1f}"
+    return int(total_effective_seconds), days, formatted_hours, formatted_minutes, formatted_seconds, formatted_total_hours
@@ -0,0 +1,63 @@
+"""每个用户单调递增的数据版本号。
+
+所有改动会话或科目的操作都在同一事务内把版本号加一；读接口用 (版本号, 端点, 查询参数) 生成 ETag，
+版本未变时直接返回 304，只需一次按主键查询 user 表，不再查询会话表，也不再序列化 JSON。
+"""
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from flask_login import current_user
+from sqlalchemy import update
+from project import db
+from project.models import User
+
+
+def bump(user_id):
+    """把该用户的数据版本号加一，调用方负责提交事务。"""
+    db.session.execute(
+        update(User).where(User.id == user_id).values(data_version=User.data_version + 1),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def bump_all():
+    """批量修复或重建汇总表后，所有用户的缓存响应一并失效。"""
+    db.session.execute(
+        update(User).values(data_version=User.data_version + 1),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def current(user_id):
+    return db.session.query(User.data_version).filter(User.id == user_id).scalar() or 0
+
+
+def _etag(user_id, version, extra=''):
+    params = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    return hashlib.sha1(f'{user_id}:{version}:{request.endpoint}:{params}:{extra}'.encode()).hexdigest()[:20]
+
+
+def conditional(view=None, *, vary=None):
+    """为返回 JSON 的 GET 视图加上基于数据版本的 ETag，If-None-Match 命中时返回 304。
+
+    使用弱 ETag，因为同一内容可能以不同的 Content-Encoding 压缩发送。
+    响应还取决于查询参数以外的输入（如缺省为今天的日期）时，用 vary 传入返回该输入的函数，其结果计入 ETag。
+    """
+    if view is None:
+        return lambda view: conditional(view, vary=vary)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # 先读版本再生成响应：期间若有写入，ETag 只会比内容旧，下次请求会重新获取
+        etag = _etag(current_user.id, current(current_user.id), vary() if vary else '')
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        # 浏览器可以缓存响应，但每次使用前都要带 If-None-Match 重新验证
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
@@ -0,0 +1,42 @@
+"""日期筛选参数的解析，供查询接口（request.args）和批量编辑（操作对象）共用。"""
+import datetime
+
+
+def _naive_utc(value):
+    """把带时区的时间换算为无时区的 UTC，与数据库中的时间列一致。"""
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_date_range(args):
+    """解析日期筛选参数，返回 (start_utc, end_utc, day_aligned)，时间均为无时区的 UTC，不筛选时为 (None, None, True)。
+
+    支持两种参数：start_date_utc/end_date_utc（ISO 8601，如“今日”按本地时区换算出的精确区间），
+    以及 start_date/end_date（YYYY-MM-DD，按UTC整天划分，end_date 默认等于 start_date）。
+    day_aligned 表示区间是否按UTC整天划分（或不筛选），格式或类型错误时抛出带错误信息的 ValueError。
+    """
+    values = {key: args.get(key) for key in ('start_date', 'end_date', 'start_date_utc', 'end_date_utc')}
+    if any(value is not None and not isinstance(value, str) for value in values.values()):
+        raise ValueError('日期参数必须是字符串')
+
+    # 优先处理来自“今日”的精确UTC时间范围
+    if values['start_date_utc'] and values['end_date_utc']:
+        try:
+            start = _naive_utc(datetime.datetime.fromisoformat(values['start_date_utc'].replace('Z', '+00:00')))
+            end = _naive_utc(datetime.datetime.fromisoformat(values['end_date_utc'].replace('Z', '+00:00')))
+        except (ValueError, OverflowError):
+            raise ValueError('无效的UTC日期格式')
+        return start, end, False
+
+    # 否则，处理来自日期选择器的 YYYY-MM-DD 格式
+    if values['start_date']:
+        try:
+            start = datetime.datetime.strptime(values['start_date'], '%Y-%m-%d')
+            end = datetime.datetime.strptime(values['end_date'], '%Y-%m-%d') if values['end_date'] else start
+            end += datetime.timedelta(days=1)
+        except (ValueError, OverflowError):
+            raise ValueError('无效的日期格式')
+        return start, end, True
+
+    return None, None, True
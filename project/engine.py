@@ -0,0 +1,93 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from project import db
+
+# 各配置档下建立 SQLite 连接时执行的 PRAGMA；development 保持 SQLite 默认行为
+SQLITE_PRAGMAS = {
+    'development': {},
+    'production': {
+        # WAL 下读不阻塞写、写不阻塞读；该设置写入数据库文件，切回 development 后仍然保留
+        'journal_mode': 'WAL',
+        # WAL 模式下 NORMAL 不会损坏数据库，只可能在断电时丢失最后几个事务
+        'synchronous': 'NORMAL',
+        'busy_timeout': lambda config: config['SQLITE_BUSY_TIMEOUT_MS'],
+        'mmap_size': lambda config: config['SQLITE_MMAP_SIZE'],
+        # 负数表示以 KiB 为单位
+        'cache_size': lambda config: -config['SQLITE_CACHE_SIZE_KB'],
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def normalize_database_url(url):
+    """部分平台提供的 DATABASE_URL 以 postgres:// 开头，SQLAlchemy 只识别 postgresql://。"""
+    if url and url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def _is_file_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def engine_options(config):
+    """按 DB_PROFILE 和数据库类型生成 SQLALCHEMY_ENGINE_OPTIONS，已显式配置的项优先。"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    profile = config['DB_PROFILE']
+    if profile not in SQLITE_PRAGMAS:
+        raise ValueError(f'未知的 DB_PROFILE: {profile}（可选 {", ".join(SQLITE_PRAGMAS)}）')
+
+    options = {}
+    if url.get_backend_name() == 'postgresql':
+        options = {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            # 回收长时间空闲的连接，并在取出时探测，避免使用被服务器或中间代理断开的连接
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+        }
+    elif _is_file_sqlite(url) and profile == 'production':
+        # 内存数据库由 Flask-SQLAlchemy 固定为 StaticPool，不能设置池大小
+        options = {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+        }
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def configure_engine(app):
+    """在 db.init_app 之前调用：整理数据库地址并写入引擎参数。"""
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def init_engine(app):
+    """在 db.init_app 之后调用：为 SQLite 连接注册建立连接时执行的 PRAGMA。"""
+    pragmas = SQLITE_PRAGMAS[app.config['DB_PROFILE']]
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    statements = [
+        f'PRAGMA {name}={value(app.config) if callable(value) else value}'
+        for name, value in pragmas.items()
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+
+
+def sqlite_settings():
+    """读取当前连接上实际生效的 PRAGMA，供 CLI 显示。"""
+    connection = db.session.connection()
+    return {
+        name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+        for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store')
+    }
@@ -0,0 +1,82 @@
+import json
+import threading
+from collections import defaultdict, deque
+
+
+class InProcessBroker:
+    """进程内的按用户发布/订阅，保留每个用户最近的若干条事件以便断线重连后补发。
+
+    只在单个 worker 进程内可见；多 worker 部署请改用 RedisBroker。
+    在 gevent worker 下 threading 会被 monkey patch，等待不会占用系统线程。
+    """
+
+    def __init__(self, history=100):
+        self._condition = threading.Condition()
+        self._events = defaultdict(lambda: deque(maxlen=history))
+        self._last_id = 0
+
+    def publish(self, user_id, event_type, data):
+        with self._condition:
+            self._last_id += 1
+            self._events[user_id].append((str(self._last_id), event_type, data))
+            self._condition.notify_all()
+
+    def _newer(self, user_id, last_id):
+        last_id = int(last_id or 0)
+        return [e for e in self._events.get(user_id, ()) if int(e[0]) > last_id]
+
+    def latest_id(self, user_id):
+        with self._condition:
+            events = self._events.get(user_id)
+            return events[-1][0] if events else str(self._last_id)
+
+    def wait(self, user_id, last_id, timeout):
+        """阻塞至多 timeout 秒，返回 last_id 之后的事件列表 [(id, 类型, 数据)]。"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._newer(user_id, last_id), timeout)
+            return self._newer(user_id, last_id)
+
+
+class RedisBroker:
+    """基于 Redis Stream 的实现，多个 gunicorn worker 共享同一事件流。"""
+
+    def __init__(self, url, history=100):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('使用 RedisBroker 需要安装 redis 包')
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._history = history
+
+    @staticmethod
+    def _key(user_id):
+        return f'study_tracker:events:{user_id}'
+
+    def publish(self, user_id, event_type, data):
+        self._redis.xadd(self._key(user_id), {'type': event_type, 'data': json.dumps(data)},
+                         maxlen=self._history, approximate=True)
+
+    def latest_id(self, user_id):
+        entries = self._redis.xrevrange(self._key(user_id), count=1)
+        return entries[0][0] if entries else '0'
+
+    def wait(self, user_id, last_id, timeout):
+        # block=0 在 Redis 中表示无限等待，timeout 为 0 时不阻塞
+        result = self._redis.xread({self._key(user_id): last_id or '0'}, block=int(timeout * 1000) or None)
+        if not result:
+            return []
+        return [(event_id, fields['type'], json.loads(fields['data'])) for event_id, fields in result[0][1]]
+
+
+broker = None
+
+
+def init_broker(app):
+    global broker
+    url = app.config.get('EVENT_BROKER_URL')
+    broker = RedisBroker(url) if url else InProcessBroker()
+
+
+def publish(user_id, event_type, data):
+    """在数据库提交之后调用，向该用户的所有页面推送状态变化。"""
+    broker.publish(user_id, event_type, data)
@@ -0,0 +1,154 @@
+import heapq
+import hmac
+import threading
+import time
+from flask import g, request, has_request_context, Response, abort
+from sqlalchemy import event
+from project import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """当前 worker 进程内的请求与 SQL 统计（各 worker 独立，由 Prometheus 分别抓取后汇总）。"""
+
+    def __init__(self, slow_query_limit=20):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.queries = {}
+        self.requests = {}
+        self.slow_query_limit = slow_query_limit
+        # 最小堆保存耗时最长的若干条 SQL：(耗时, 语句)
+        self._slow_queries = []
+
+    def observe_request(self, endpoint, method, status, seconds, query_count):
+        with self._lock:
+            self.latency.setdefault(endpoint, _Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.queries.setdefault(endpoint, _Histogram(QUERY_COUNT_BUCKETS)).observe(query_count)
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def observe_query(self, statement, seconds):
+        with self._lock:
+            item = (seconds, ' '.join(statement.split()))
+            if len(self._slow_queries) < self.slow_query_limit:
+                heapq.heappush(self._slow_queries, item)
+            elif seconds > self._slow_queries[0][0]:
+                heapq.heapreplace(self._slow_queries, item)
+
+    def slow_queries(self):
+        with self._lock:
+            return sorted(self._slow_queries, reverse=True)
+
+    def render(self, extra_lines=()):
+        """按 Prometheus 文本格式输出。"""
+        lines = []
+        with self._lock:
+            lines += ['# HELP study_tracker_requests_total 按端点、方法和状态码统计的请求数',
+                      '# TYPE study_tracker_requests_total counter']
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'study_tracker_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+            lines += _render_histograms('study_tracker_request_duration_seconds', '请求耗时（秒）', self.latency)
+            lines += _render_histograms('study_tracker_request_queries', '每个请求执行的 SQL 语句数', self.queries)
+        lines += ['# HELP study_tracker_slow_query_seconds 本进程内耗时最长的 SQL 语句',
+                  '# TYPE study_tracker_slow_query_seconds gauge']
+        for seconds, statement in self.slow_queries():
+            lines.append(f'study_tracker_slow_query_seconds{{statement="{_escape(statement)}"}} {seconds:.6f}')
+        lines += list(extra_lines)
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _render_histograms(name, help_text, histograms):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for endpoint, hist in sorted(histograms.items()):
+        for upper, count in zip(hist.buckets, hist.counts):
+            lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{upper}"}} {count}')
+        lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {hist.count}')
+        lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {hist.sum:.6f}')
+        lines.append(f'{name}_count{{endpoint="{endpoint}"}} {hist.count}')
+    return lines
+
+
+metrics = None
+
+
+def init_instrumentation(app):
+    """METRICS_ENABLED 为真时挂载请求计时、SQL 计数和 /metrics 端点。"""
+    global metrics
+    metrics = Metrics(app.config['METRICS_SLOW_QUERY_LIMIT'])
+    threshold = app.config['METRICS_N_PLUS_ONE_THRESHOLD']
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['query_start_time'].pop()
+        metrics.observe_query(statement, seconds)
+        if has_request_context() and 'metrics_query_count' in g:
+            g.metrics_query_count += 1
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start_time = time.perf_counter()
+        g.metrics_query_count = 0
+
+    @app.after_request
+    def _record_request(response):
+        if 'metrics_start_time' not in g:
+            return response
+        endpoint = request.endpoint or 'unknown'
+        seconds = time.perf_counter() - g.metrics_start_time
+        metrics.observe_request(endpoint, request.method, response.status_code, seconds, g.metrics_query_count)
+        if g.metrics_query_count > threshold:
+            app.logger.warning(
+                '疑似 N+1 查询：%s %s 执行了 %d 条 SQL（阈值 %d），耗时 %.1fms',
+                request.method, request.path, g.metrics_query_count, threshold, seconds * 1000
+            )
+        return response
+
+    token = app.config['METRICS_TOKEN']
+
+    def metrics_endpoint():
+        # 响应中包含 SQL 文本，不能公开访问
+        if token:
+            if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+                abort(403)
+        elif request.remote_addr not in LOOPBACK_ADDRESSES:
+            abort(403)
+        from project import cache
+        cache_stats = cache.stats()
+        extra = [
+            '# TYPE study_tracker_cache_hits_total counter',
+            f"study_tracker_cache_hits_total {cache_stats['hits']}",
+            '# TYPE study_tracker_cache_misses_total counter',
+            f"study_tracker_cache_misses_total {cache_stats['misses']}",
+        ]
+        return Response(metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
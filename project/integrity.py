@@ -0,0 +1,188 @@
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import select, update, delete, func, or_, and_, exists
+from sqlalchemy.orm import aliased
+from project import db, segments
+from project.models import User, Subject, StudySession, StudySegment, OPEN_SESSION_STATUSES
+
+CHUNK_SIZE = 5000
+
+
+class Check:
+    """一项集合式数据检验：condition 是一个 SQL 谓词，命中的行即为错误。
+
+    fix 可以是 'delete'、固定的更新值 dict，或接收一行返回更新值的函数（按主键批量更新）。
+    """
+
+    def __init__(self, name, description, model, condition, columns, fix=None):
+        self.name = name
+        self.description = description
+        self.model = model
+        self.condition = condition
+        self.columns = columns
+        self.fix = fix
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        """按主键做键集分页，逐块产出命中的行，内存占用与表大小无关。"""
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(self.model.id, *self.columns)
+                .where(self.condition, self.model.id > last_id)
+                .order_by(self.model.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1].id
+
+    def apply_fix(self, rows):
+        ids = [row.id for row in rows]
+        if self.fix == 'delete':
+            if self.model is Subject:
+                # 删除孤立科目前先删除引用它的会话
+                segments.delete_segments([StudySession.subject_id.in_(ids)])
+                db.session.execute(delete(StudySession).where(StudySession.subject_id.in_(ids)))
+            elif self.model is StudySession:
+                segments.delete_segments([StudySession.id.in_(ids)])
+            db.session.execute(delete(self.model).where(self.model.id.in_(ids)))
+        elif isinstance(self.fix, dict):
+            db.session.execute(update(self.model).where(self.model.id.in_(ids)).values(**self.fix))
+        else:
+            db.session.execute(update(self.model), [{'id': row.id, **self.fix(row)} for row in rows])
+        db.session.commit()
+
+
+def _end_from_duration(row):
+    return {'end_time': row.creation_time + datetime.timedelta(seconds=max(0, row.accumulated_seconds or 0))}
+
+
+def _close_duplicate_open_session(row):
+    return {'status': 'completed', 'last_start_time': None, 'end_time': row.last_start_time or row.creation_time}
+
+
+def _close_segment_at_start(row):
+    # 真实的结束时间已无从得知，按零长度关闭，不计入任何统计
+    return {'end_time': row.start_time}
+
+
+def _name_empty_subject(row):
+    return {'name': f'未命名科目{row.id}'}
+
+
+def _build_checks():
+    newer_open = aliased(StudySession)
+    return [
+        Check('negative_duration', '累计时长 (accumulated_seconds) 为负数',
+              StudySession, StudySession.accumulated_seconds < 0,
+              [StudySession.accumulated_seconds], fix={'accumulated_seconds': 0}),
+        Check('end_before_creation', '结束时间 (end_time) 早于创建时间 (creation_time)',
+              StudySession, StudySession.end_time < StudySession.creation_time,
+              [StudySession.creation_time, StudySession.end_time, StudySession.accumulated_seconds],
+              fix=_end_from_duration),
+        Check('active_without_start', "状态为 'active' 但 last_start_time 为空",
+              StudySession, and_(StudySession.status == 'active', StudySession.last_start_time.is_(None)),
+              [StudySession.status], fix={'status': 'paused'}),
+        Check('inactive_with_start', "状态不是 'active' 但 last_start_time 不为空",
+              StudySession, and_(StudySession.status != 'active', StudySession.last_start_time.isnot(None)),
+              [StudySession.status], fix={'last_start_time': None}),
+        Check('duplicate_open_session', '同一用户存在多个进行中的会话（保留最新的一个）',
+              StudySession, and_(
+                  StudySession.status.in_(OPEN_SESSION_STATUSES),
+                  exists().where(newer_open.user_id == StudySession.user_id,
+                                 newer_open.status.in_(OPEN_SESSION_STATUSES),
+                                 newer_open.id > StudySession.id)),
+              [StudySession.user_id, StudySession.creation_time, StudySession.last_start_time],
+              fix=_close_duplicate_open_session),
+        Check('session_orphan_user', '关联的用户 (user_id) 不存在',
+              StudySession, ~exists().where(User.id == StudySession.user_id),
+              [StudySession.user_id], fix='delete'),
+        Check('session_orphan_subject', '关联的科目 (subject_id) 不存在',
+              StudySession, ~exists().where(Subject.id == StudySession.subject_id),
+              [StudySession.subject_id], fix='delete'),
+        Check('segment_orphan_session', '学习区间关联的会话 (session_id) 不存在',
+              StudySegment, ~exists().where(StudySession.id == StudySegment.session_id),
+              [StudySegment.session_id], fix='delete'),
+        Check('segment_open_inactive_session', "未结束的学习区间所属会话状态不是 'active'",
+              StudySegment, and_(StudySegment.end_time.is_(None),
+                                 ~exists().where(StudySession.id == StudySegment.session_id, StudySession.status == 'active')),
+              [StudySegment.session_id, StudySegment.start_time], fix=_close_segment_at_start),
+        Check('subject_empty_name', '科目名称 (name) 为空',
+              Subject, or_(Subject.name.is_(None), func.trim(Subject.name) == ''),
+              [Subject.name], fix=_name_empty_subject),
+        Check('subject_orphan_user', '关联的用户 (user_id) 不存在',
+              Subject, ~exists().where(User.id == Subject.user_id),
+              [Subject.user_id], fix='delete'),
+        Check('user_empty_username', '用户名 (username) 为空',
+              User, or_(User.username.is_(None), func.trim(User.username) == ''),
+              [User.username]),
+    ]
+
+
+def _describe_row(check, row):
+    details = ', '.join(f'{column.key}={getattr(row, column.key)}' for column in check.columns)
+    return f'{check.model.__name__} ID {row.id}: {check.description} ({details})'
+
+
+def _run_check(app, check, max_samples, on_finding):
+    with app.app_context():
+        started = time.perf_counter()
+        count, samples = 0, []
+        for rows in check.iter_chunks():
+            for row in rows:
+                if len(samples) < max_samples:
+                    samples.append(_describe_row(check, row))
+                    on_finding(check, samples[-1])
+            count += len(rows)
+        return {
+            'name': check.name,
+            'table': check.model.__tablename__,
+            'description': check.description,
+            'count': count,
+            'samples': samples,
+            'fixable': check.fix is not None,
+            'fixed': 0,
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+
+
+def verify(fix=False, jobs=1, max_samples=20, on_finding=lambda check, message: None):
+    """执行全部检验，返回报告 dict。
+
+    检验阶段只读，可用 jobs 个线程并行执行；--fix 的修复阶段按检验顺序串行、分批提交。
+    """
+    app = current_app._get_current_object()
+    checks = _build_checks()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        results = list(pool.map(lambda check: _run_check(app, check, max_samples, on_finding), checks))
+
+    sessions_changed = False
+    if fix:
+        for check, result in zip(checks, results):
+            if not result['count'] or check.fix is None:
+                continue
+            # 修复后的行不再满足谓词，键集分页会自然地向后推进
+            for rows in check.iter_chunks():
+                check.apply_fix(rows)
+                result['fixed'] += len(rows)
+            sessions_changed = sessions_changed or check.model in (StudySession, Subject)
+        if sessions_changed:
+            from project.rollup import rebuild_rollup
+            rebuild_rollup()
+        if any(r['fixed'] for r in results):
+            # 修复可能改动了科目名称或删除了用户/科目，缓存整体失效
+            from project import cache
+            cache.clear()
+
+    return {
+        'checked_at': datetime.datetime.utcnow().isoformat() + 'Z',
+        'errors_found': sum(r['count'] for r in results),
+        'errors_fixed': sum(r['fixed'] for r in results),
+        'rollup_rebuilt': sessions_changed,
+        'seconds': round(time.perf_counter() - started, 3),
+        'checks': results,
+    }
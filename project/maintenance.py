@@ -0,0 +1,141 @@
+"""定期维护任务：自动结束被遗忘的会话、把旧的已完成会话移入归档表。
+
+两个任务都是集合式的 UPDATE/DELETE ... RETURNING，可重复执行，多个进程同时执行也不会重复处理同一行。
+可以用 `flask manage run-maintenance` 由 cron 调度，也可以设置 MAINTENANCE_INTERVAL_SECONDS
+在 Web 进程内的后台线程中定期执行（多个 worker 时借助缓存计数器，每个周期只有一个 worker 执行）。
+"""
+import calendar
+import datetime
+import os
+import threading
+import time
+from sqlalchemy import update, delete
+from project import db, cache, dataversion, events
+from project.models import StudySession, StudySegment, ArchivedStudySession, ArchivedStudySegment
+
+SESSION_COLUMNS = ('id', 'subject_id', 'status', 'creation_time', 'end_time', 'accumulated_seconds', 'user_id', 'auto_closed')
+SEGMENT_COLUMNS = ('id', 'session_id', 'user_id', 'start_time', 'end_time')
+
+
+def close_stale_sessions(max_hours, now=None):
+    """结束计时已超过 max_hours 小时的 active 会话，返回结束的会话数。
+
+    这段计时无法确认是否真的在学习（通常是忘了关掉页面），因此不计入时长：会话在最后一次开始计时的时刻结束，
+    未结束的区间按零长度关闭。accumulated_seconds 不变，按日汇总表也无需重新计算。
+    为了不让这段时间悄无声息地丢失，会话同时标记为 auto_closed，历史记录中会显示出来，
+    用户可以通过修改时长补上实际学习的时间（修改后标记清除）。
+    """
+    now = now or datetime.datetime.utcnow()
+    cutoff = now - datetime.timedelta(hours=max_hours)
+    closed = db.session.execute(
+        update(StudySession).where(
+            StudySession.status == 'active', StudySession.last_start_time < cutoff
+        ).values(status='completed', end_time=StudySession.last_start_time, last_start_time=None, auto_closed=True)
+        .returning(StudySession.id, StudySession.user_id),
+        execution_options={'synchronize_session': False}
+    ).all()
+    if not closed:
+        db.session.rollback()
+        return 0
+    db.session.execute(
+        update(StudySegment).where(
+            StudySegment.session_id.in_([session_id for session_id, _ in closed]), StudySegment.end_time.is_(None)
+        ).values(end_time=StudySegment.start_time),
+        execution_options={'synchronize_session': False}
+    )
+    user_ids = sorted({user_id for _, user_id in closed})
+    for user_id in user_ids:
+        dataversion.bump(user_id)
+    db.session.commit()
+    for user_id in user_ids:
+        events.publish(user_id, 'session', {'session': None})
+    return len(closed)
+
+
+def months_ago(now, months):
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    return now.replace(year=year, month=month + 1, day=min(now.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def archive_old_sessions(months, chunk_size=1000, now=None):
+    """把创建时间早于 months 个月前的已完成会话及其区间移入归档表，返回移动的会话数。
+
+    每批先 DELETE ... RETURNING 取出被删除的行再写入归档表，删除与写入在同一事务中，
+    期间对这些行的并发修改要么在删除前完成（随行一起归档），要么找不到行。
+    按日汇总表不变：汇总的重新计算会同时读取归档表，合计时长保持一致。
+    """
+    cutoff = months_ago(now or datetime.datetime.utcnow(), months)
+    moved, last_id = 0, 0
+    while True:
+        ids = db.session.scalars(
+            db.select(StudySession.id).where(
+                StudySession.id > last_id, StudySession.status == 'completed', StudySession.creation_time < cutoff
+            ).order_by(StudySession.id).limit(chunk_size)
+        ).all()
+        if not ids:
+            return moved
+        last_id = ids[-1]
+        sessions = db.session.execute(
+            delete(StudySession).where(StudySession.id.in_(ids), StudySession.status == 'completed')
+            .returning(*(getattr(StudySession, c) for c in SESSION_COLUMNS)),
+            execution_options={'synchronize_session': False}
+        ).all()
+        if sessions:
+            segments = db.session.execute(
+                delete(StudySegment).where(StudySegment.session_id.in_([row.id for row in sessions]))
+                .returning(*(getattr(StudySegment, c) for c in SEGMENT_COLUMNS)),
+                execution_options={'synchronize_session': False}
+            ).all()
+            db.session.execute(db.insert(ArchivedStudySession), [row._asdict() for row in sessions])
+            if segments:
+                db.session.execute(db.insert(ArchivedStudySegment), [row._asdict() for row in segments])
+        db.session.commit()
+        moved += len(sessions)
+
+
+def run_all(config):
+    """按配置执行全部维护任务，返回 {任务名: 处理的行数}；对应的配置为 0 时跳过该任务。"""
+    results = {}
+    if config['STALE_SESSION_MAX_HOURS']:
+        results['close_stale_sessions'] = close_stale_sessions(config['STALE_SESSION_MAX_HOURS'])
+    if config['ARCHIVE_AFTER_MONTHS']:
+        results['archive_old_sessions'] = archive_old_sessions(config['ARCHIVE_AFTER_MONTHS'], config['ARCHIVE_CHUNK_SIZE'])
+    return results
+
+
+# --- 进程内调度 ---
+def _scheduler_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        # 固定窗口计数器：同一周期内只有第一个拿到 1 的 worker 执行（进程内缓存时每个 worker 各自执行，任务本身可重复执行）
+        if cache.incr('maintenance:lease', interval) != 1:
+            continue
+        with app.app_context():
+            try:
+                results = run_all(app.config)
+                if any(results.values()):
+                    app.logger.info(f'维护任务完成: {results}')
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('维护任务执行失败')
+
+
+def init_maintenance(app):
+    """MAINTENANCE_INTERVAL_SECONDS 大于 0 时，每个进程在处理第一个请求时启动后台维护线程。
+
+    线程不能跨 fork 存活，gunicorn preload_app 时应用在 master 中创建，因此推迟到 worker 中启动。
+    """
+    interval = app.config['MAINTENANCE_INTERVAL_SECONDS']
+    if not interval:
+        return
+    started = {'pid': None}
+    lock = threading.Lock()
+
+    @app.before_request
+    def _start_scheduler():
+        if started['pid'] == os.getpid():
+            return
+        with lock:
+            if started['pid'] != os.getpid():
+                started['pid'] = os.getpid()
+                threading.Thread(target=_scheduler_loop, args=(app, interval), name='maintenance', daemon=True).start()
@@ -0,0 +1,215 @@
+from flask import current_app
+from sqlalchemy import func, inspect, select, text
+from project import db
+from project.models import User, StudySession, StudySegment, ArchivedStudySession, ArchivedStudySegment, Subject, DailyStudyRollup, SchemaMigration, OPEN_SESSION_STATUSES
+
+# 按版本号顺序执行的迁移步骤，每一步都必须可重复执行；返回 False 表示暂缓，下次继续执行
+MIGRATIONS = []
+
+
+def migration(version, name):
+    def decorator(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def _create_missing_indexes(model, skip=()):
+    bind = db.session.connection()
+    for index in model.__table__.indexes:
+        if index.name not in skip:
+            index.create(bind, checkfirst=True)
+
+
+def _add_missing_columns(model):
+    """为已有表补加模型中新增的列（可为空，或带有 server_default）。"""
+    table = model.__table__
+    bind = db.session.connection()
+    existing = {c['name'] for c in inspect(bind).get_columns(table.name)}
+    preparer = bind.dialect.identifier_preparer
+    for column in table.columns:
+        if column.name not in existing:
+            definition = column.type.compile(dialect=bind.dialect)
+            if column.server_default is not None:
+                definition += f' NOT NULL DEFAULT {column.server_default.arg}'
+            bind.execute(text(
+                f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {definition}'
+            ))
+
+
+@migration(0, 'create_schema')
+def create_schema():
+    """创建所有尚不存在的表（含其索引）。已有的表不做改动，由后续的迁移补加列和索引。"""
+    db.metadata.create_all(db.session.connection())
+
+
+@migration(1, 'backfill_daily_rollup')
+def backfill_daily_rollup():
+    """首次引入按日汇总表时，从已有学习记录回填。"""
+    if db.session.query(DailyStudyRollup.user_id).first() is None and db.session.query(StudySession.id).first() is not None:
+        from project.rollup import rebuild_rollup
+        rebuild_rollup(bump_versions=False)
+
+
+@migration(2, 'add_study_session_indexes')
+def add_study_session_indexes():
+    """为已有数据库补建复合索引和“每个用户仅一个进行中会话”的部分唯一索引。"""
+    _create_missing_indexes(Subject)
+    _create_missing_indexes(DailyStudyRollup)
+    _create_missing_indexes(StudySession, skip={'uq_study_session_one_open_per_user'})
+
+    duplicated_users = db.session.query(StudySession.user_id).filter(
+        StudySession.status.in_(OPEN_SESSION_STATUSES)
+    ).group_by(StudySession.user_id).having(func.count() > 1).all()
+    if duplicated_users:
+        # 已有脏数据时无法建立唯一索引，本次迁移不记为完成，待数据修复后再次执行
+        user_ids = ', '.join(str(u) for u, in duplicated_users)
+        current_app.logger.warning(f'以下用户存在多个进行中的会话，暂不创建唯一索引: {user_ids}')
+        return False
+    _create_missing_indexes(StudySession)
+
+
+@migration(3, 'add_user_countdown_settings')
+def add_user_countdown_settings():
+    """为 user 表补加每个用户的倒计时目标和有效时段列。"""
+    _add_missing_columns(User)
+
+
+@migration(4, 'add_user_data_version')
+def add_user_data_version():
+    """为 user 表补加数据版本号列。"""
+    _add_missing_columns(User)
+
+
+@migration(5, 'add_study_segments')
+def add_study_segments():
+    """创建学习区间表，并为已有会话按键集分批回填近似区间（结束时间往前推累计时长的一段）。"""
+    from project.segments import synthetic_segment
+    StudySegment.__table__.create(db.session.connection(), checkfirst=True)
+    _create_missing_indexes(StudySegment)
+    if db.session.query(StudySegment.id).first() is not None:
+        return
+
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            StudySession.id, StudySession.user_id, StudySession.status, StudySession.creation_time,
+            StudySession.last_start_time, StudySession.end_time, StudySession.accumulated_seconds
+        ).filter(StudySession.id > last_id).order_by(StudySession.id).limit(1000).all()
+        if not rows:
+            break
+        segments = []
+        for row in rows:
+            if row.accumulated_seconds:
+                # 进行中的会话没有 end_time，已累计的部分放在本次开始计时之前
+                end = row.end_time or (row.last_start_time if row.status == 'active' else None)
+                start, end = synthetic_segment(row.creation_time, end, row.accumulated_seconds)
+                segments.append({'session_id': row.id, 'user_id': row.user_id, 'start_time': start, 'end_time': end})
+            if row.status == 'active' and row.last_start_time:
+                segments.append({'session_id': row.id, 'user_id': row.user_id, 'start_time': row.last_start_time, 'end_time': None})
+        if segments:
+            db.session.execute(db.insert(StudySegment), segments)
+        last_id = rows[-1].id
+
+
+@migration(6, 'add_archive_tables')
+def add_archive_tables():
+    """创建归档会话与归档区间表。"""
+    for model in (ArchivedStudySession, ArchivedStudySegment):
+        model.__table__.create(db.session.connection(), checkfirst=True)
+        _create_missing_indexes(model)
+
+
+@migration(7, 'add_archived_segment_session_index')
+def add_archived_segment_session_index():
+    """归档区间按会话ID删除（批量删除已归档的会话）时使用的索引。"""
+    _create_missing_indexes(ArchivedStudySegment)
+
+
+
+def _rebuild_with_autoincrement(model):
+    """SQLite 不能给已有表加 AUTOINCREMENT：新建带 AUTOINCREMENT 的表、复制数据、删除旧表后改名，再重建原有的索引。"""
+    bind = db.session.connection()
+    table = model.__table__
+    inspector = inspect(bind)
+    existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+    existing_indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+    # 临时表放进同一个 MetaData 才能解析外键，建好后立即移除；索引名与旧表冲突，改名后再按原名创建
+    new_table = table.to_metadata(db.metadata, name=f'{table.name}_new')
+    new_table.indexes.clear()
+    try:
+        new_table.create(bind)
+    finally:
+        db.metadata.remove(new_table)
+    preparer = bind.dialect.identifier_preparer
+    columns = ', '.join(preparer.format_column(c) for c in table.columns if c.name in existing_columns)
+    bind.exec_driver_sql(f'INSERT INTO {new_table.name} ({columns}) SELECT {columns} FROM {table.name}')
+    bind.exec_driver_sql(f'DROP TABLE {table.name}')
+    bind.exec_driver_sql(f'ALTER TABLE {new_table.name} RENAME TO {table.name}')
+    # 迁移 2 因数据不满足而暂缓的唯一索引仍然不建
+    for index in table.indexes:
+        if index.name in existing_indexes:
+            index.create(bind)
+
+
+def _reserve_archived_ids(model, archived_model, renumber=()):
+    """在用表中与归档表相同的 ID 改为新的 ID（同时更新 renumber 中引用它的列），并让 AUTOINCREMENT 跳过所有已归档的 ID。"""
+    bind = db.session.connection()
+    table, archived = model.__table__, archived_model.__table__
+    next_id = max(bind.execute(select(func.max(table.c.id))).scalar() or 0,
+                  bind.execute(select(func.max(archived.c.id))).scalar() or 0)
+    colliding = bind.execute(select(table.c.id).where(table.c.id.in_(select(archived.c.id))).order_by(table.c.id)).scalars().all()
+    for old_id in colliding:
+        next_id += 1
+        bind.execute(table.update().where(table.c.id == old_id).values(id=next_id))
+        for column in renumber:
+            bind.execute(column.table.update().where(column == old_id).values({column.name: next_id}))
+    bind.exec_driver_sql('DELETE FROM sqlite_sequence WHERE name = ?', (table.name,))
+    bind.exec_driver_sql('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table.name, next_id))
+
+
+@migration(8, 'sqlite_autoincrement_session_ids')
+def sqlite_autoincrement_session_ids():
+    """SQLite 的在用会话表和区间表改为 AUTOINCREMENT，不再复用已归档的 ID；已经重复的 ID 重新编号。
+    PostgreSQL 的序列本来就不会回退，无需处理。"""
+    bind = db.session.connection()
+    if bind.dialect.name != 'sqlite':
+        return
+    if bind.exec_driver_sql('PRAGMA foreign_keys').scalar():
+        # 重建表需要删除被引用的旧表，开启外键检查时无法进行
+        current_app.logger.warning('SQLite 开启了 foreign_keys，暂缓将会话表改为 AUTOINCREMENT')
+        return False
+    for model in (StudySession, StudySegment):
+        ddl = bind.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (model.__tablename__,)).scalar()
+        if 'AUTOINCREMENT' not in ddl.upper():
+            _rebuild_with_autoincrement(model)
+    _reserve_archived_ids(StudySession, ArchivedStudySession, renumber=(StudySegment.session_id,))
+    _reserve_archived_ids(StudySegment, ArchivedStudySegment)
+
+
+@migration(9, 'add_session_auto_closed')
+def add_session_auto_closed():
+    """标记由维护任务自动结束的会话，供用户在历史记录中找到并更正时长。"""
+    _add_missing_columns(StudySession)
+    _add_missing_columns(ArchivedStudySession)
+
+def pending_migrations():
+    if not inspect(db.engine).has_table(SchemaMigration.__tablename__):
+        return list(MIGRATIONS)
+    applied = {v for v, in db.session.query(SchemaMigration.version).all()}
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def upgrade():
+    """执行所有未执行的迁移，返回本次执行的 (版本号, 名称) 列表。"""
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    applied = []
+    for version, name, fn in pending_migrations():
+        if fn() is False:
+            db.session.commit()
+            continue
+        db.session.add(SchemaMigration(version=version, name=name))
+        db.session.commit()
+        applied.append((version, name))
+    return applied
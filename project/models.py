@@ -1,11 +1,20 @@
+from flask import current_app
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
-from project import db, login_manager
+from sqlalchemy.orm import make_transient_to_detached
+from project import db, login_manager, cache
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # 每个已登录请求都会调用，优先从缓存恢复，避免每次都查询 user 表
+    cached = cache.get(cache.user_key(user_id))
+    if cached is not None:
+        return User.from_cache(cached)
+    user = db.session.get(User, int(user_id))
+    if user is not None:
+        cache.set(cache.user_key(user_id), user.to_cache())
+    return user
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -14,18 +23,55 @@ class User(UserMixin, db.Model):
     sessions = db.relationship('StudySession', backref='author', lazy='dynamic')
     # 新增：用户与科目的关联
     subjects = db.relationship('Subject', backref='author', lazy='dynamic', cascade="all, delete-orphan")
+    # 新增：倒计时设置，为空时使用配置中的默认值
+    countdown_target = db.Column(db.DateTime, nullable=True)
+    effective_start_hour = db.Column(db.Integer, nullable=True)
+    effective_end_hour = db.Column(db.Integer, nullable=True)
+    # 新增：数据版本号，会话或科目每次改动都加一，用于生成 ETag（不放入用户缓存，每次从数据库读取）
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, current_app.config['PASSWORD_HASH_METHOD'])
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    # 缓存中不保存密码哈希，需要时由 ORM 按需加载
+    CACHED_FIELDS = ('id', 'username', 'effective_start_hour', 'effective_end_hour')
+
+    def to_cache(self):
+        data = {field: getattr(self, field) for field in self.CACHED_FIELDS}
+        data['countdown_target'] = self.countdown_target.isoformat() if self.countdown_target else None
+        return data
+
+    @classmethod
+    def from_cache(cls, data):
+        """从缓存数据重建实例并挂到当前数据库会话上（不发出 SELECT）。"""
+        data = dict(data)
+        target = data.pop('countdown_target')
+        user = cls(**data, countdown_target=datetime.fromisoformat(target) if target else None)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def countdown_settings(self):
+        """返回 (目标时间, 每日有效开始小时, 每日有效结束小时)。"""
+        config = current_app.config
+        return (
+            self.countdown_target or config['COUNTDOWN_DEFAULT_TARGET'],
+            self.effective_start_hour if self.effective_start_hour is not None else config['COUNTDOWN_DEFAULT_START_HOUR'],
+            self.effective_end_hour if self.effective_end_hour is not None else config['COUNTDOWN_DEFAULT_END_HOUR']
+        )
+
     def __repr__(self):
         return f'<User {self.username}>'
 
 # 新增：Subject模型
 class Subject(db.Model):
+    __table_args__ = (
+        # 覆盖按用户列出科目（按名称排序）以及同名科目检查
+        db.Index('ix_subject_user_name', 'user_id', 'name'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -35,6 +81,15 @@ class Subject(db.Model):
         return {'id': self.id, 'name': self.name}
 
 class StudySession(db.Model):
+    __table_args__ = (
+        # 热点查询都以 user_id 开头，再按状态、创建时间或科目筛选
+        db.Index('ix_study_session_user_status', 'user_id', 'status'),
+        db.Index('ix_study_session_user_creation', 'user_id', 'creation_time'),
+        db.Index('ix_study_session_user_subject', 'user_id', 'subject_id'),
+        # 归档会话保留原 ID：SQLite 默认会复用当前最大的 ID，必须用 AUTOINCREMENT 保证已归档的 ID 不再分配
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     
     # 修改：subject字段改为subject_id外键
@@ -46,6 +101,8 @@ class StudySession(db.Model):
     end_time = db.Column(db.DateTime)
     accumulated_seconds = db.Column(db.Integer, default=0)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # 由维护任务自动结束（遗忘的计时未计入时长），用户修改时长后清除
+    auto_closed = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
 
     def to_dict(self):
         current_total_seconds = self.accumulated_seconds
@@ -59,4 +116,80 @@ class StudySession(db.Model):
             'accumulated_seconds': self.accumulated_seconds,
             'last_start_time_utc': self.last_start_time.isoformat() + 'Z' if self.last_start_time else None,
             'current_total_seconds': current_total_seconds
-        }
\ No newline at end of file
+        }
+
+# 每个用户最多只能有一个进行中（active/paused）的会话
+OPEN_SESSION_STATUSES = ('active', 'paused')
+db.Index(
+    'uq_study_session_one_open_per_user',
+    StudySession.user_id,
+    unique=True,
+    sqlite_where=StudySession.status.in_(OPEN_SESSION_STATUSES),
+    postgresql_where=StudySession.status.in_(OPEN_SESSION_STATUSES)
+)
+
+# 新增：会话中每一段连续计时的区间，开始/继续时插入 end_time 为空的一段，暂停/结束时补上 end_time
+class StudySegment(db.Model):
+    __table_args__ = (
+        # 按时间区间查询：end_time > 区间开始 AND start_time < 区间结束，按 end_time 做范围扫描
+        db.Index('ix_study_segment_user_end', 'user_id', 'end_time'),
+        db.Index('ix_study_segment_session', 'session_id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('study_session.id'), nullable=False)
+    # 冗余保存 user_id，区间查询不需要关联会话表
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=True)
+
+# 新增：归档的冷数据。已完成且超过 ARCHIVE_AFTER_MONTHS 的会话及其区间由维护任务原样移入，保留原 ID（在用表不会再分配这些 ID）；
+# 按日汇总表仍包含它们的时长（汇总的重新计算会同时读取归档表）
+class ArchivedStudySession(db.Model):
+    __table_args__ = (
+        db.Index('ix_archived_session_user_subject_creation', 'user_id', 'subject_id', 'creation_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    creation_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime)
+    accumulated_seconds = db.Column(db.Integer, default=0)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    auto_closed = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ArchivedStudySegment(db.Model):
+    __table_args__ = (
+        db.Index('ix_archived_segment_user_end', 'user_id', 'end_time'),
+        db.Index('ix_archived_segment_session', 'session_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    session_id = db.Column(db.Integer, db.ForeignKey('archived_study_session.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=True)
+
+# 新增：按 (用户, 科目, 日期) 预聚合的学习时长，供图表查询使用
+class DailyStudyRollup(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'subject_id', 'day', name='uq_rollup_user_subject_day'),
+        db.Index('ix_rollup_user_day', 'user_id', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    # 按会话 creation_time 的 UTC 日期归档，整个会话计入开始的那天；按日期筛选的图表改为按学习区间截取
+    day = db.Column(db.Date, nullable=False)
+    total_seconds = db.Column(db.Integer, nullable=False, default=0)
+
+
+# 新增：记录已执行的数据库迁移版本
+class SchemaMigration(db.Model):
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
\ No newline at end of file
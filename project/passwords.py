@@ -0,0 +1,124 @@
+"""密码哈希服务与登录限流。
+
+scrypt/pbkdf2 每次要占用几十毫秒的 CPU。这里把它们交给一个有界的进程池执行：
+  * 同时排队的哈希任务超过 PASSWORD_HASH_MAX_PENDING 时立即拒绝（HashServiceBusy），
+    而不是让一波集中登录拖慢所有其他路由；
+  * gevent worker 下等待结果只挂起当前协程，其他请求照常处理。
+PASSWORD_HASH_WORKERS 为 0 时在当前进程内直接计算（开发、测试环境）。
+
+登录限流使用缓存后端的计数器（配置 CACHE_URL 时在多个 worker 之间共享），按固定时间窗口统计
+每个 IP 和每个用户名的登录失败次数；成功的登录不计入。
+"""
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+from project import cache
+
+
+class HashServiceBusy(Exception):
+    pass
+
+
+class HashService:
+    def __init__(self, method, workers, max_pending, timeout):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def _executor(self):
+        # 进程池按需在当前进程中创建：gunicorn fork 出的每个 worker 各自拥有一个
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                # spawn 避免在已启动线程的进程中 fork
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashServiceBusy()
+        try:
+            return self._executor().submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashServiceBusy()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    @functools.cached_property
+    def canonical_method(self):
+        """werkzeug 写入哈希的完整方法前缀：配置的简写（如 scrypt、pbkdf2:sha256）会被补全默认参数。
+
+        对一个空密码计算一次哈希得到，每个进程只计算一次；放在第一次使用时而不是启动时，不增加 worker 的启动耗时。
+        """
+        return generate_password_hash('', self.method).split('$', 1)[0]
+
+    def needs_rehash(self, password_hash):
+        """哈希的算法或参数（$ 之前的部分）与当前配置不同时返回 True。"""
+        return password_hash.split('$', 1)[0] != self.canonical_method
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown()
+            self._pool = None
+
+
+service = None
+_limits = None
+
+
+def init_passwords(app):
+    global service, _limits
+    config = app.config
+    service = HashService(
+        config['PASSWORD_HASH_METHOD'], config['PASSWORD_HASH_WORKERS'],
+        config['PASSWORD_HASH_MAX_PENDING'], config['PASSWORD_HASH_TIMEOUT_SECONDS']
+    )
+    _limits = {
+        'ip': (config['LOGIN_MAX_FAILURES_PER_IP'], config['LOGIN_THROTTLE_WINDOW_SECONDS']),
+        'username': (config['LOGIN_MAX_FAILURES_PER_USERNAME'], config['LOGIN_THROTTLE_WINDOW_SECONDS']),
+    }
+
+
+# --- 登录限流 ---
+def _throttle_key(kind, value):
+    return f'throttle:{kind}:{value}'
+
+
+def allow_attempt(ip, username):
+    """该 IP 或该用户名在窗口内的失败次数已达上限时返回 False。只读取计数，不记录本次尝试。"""
+    for kind, value in (('ip', ip), ('username', username.lower())):
+        limit, _ = _limits[kind]
+        if not limit:
+            continue
+        # 计数器不是缓存查询，不计入 /metrics 中的缓存命中率
+        failures = cache.get(_throttle_key(kind, value), record=False)
+        if failures is not None and failures >= limit:
+            return False
+    return True
+
+
+def record_failure(ip, username):
+    for kind, value in (('ip', ip), ('username', username.lower())):
+        limit, window = _limits[kind]
+        if limit:
+            cache.incr(_throttle_key(kind, value), window)
+
+
+def reset_failures(username):
+    cache.delete(_throttle_key('username', username.lower()))
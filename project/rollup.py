@@ -0,0 +1,149 @@
+import datetime
+from sqlalchemy import func
+from project import db, dataversion
+from project.models import StudySession, ArchivedStudySession, DailyStudyRollup
+
+
+def _all_sessions():
+    """在用会话与归档会话的 UNION ALL 子查询，重新计算汇总时两者都要计入。"""
+    return db.union_all(*(
+        db.select(model.user_id, model.subject_id, model.creation_time, model.accumulated_seconds)
+        for model in (StudySession, ArchivedStudySession)
+    )).subquery('sessions')
+
+
+def _upsert_rollup(user_id, subject_id, day, total_seconds, on_conflict):
+    """插入一个 (用户, 科目, 日期) 汇总行，行已存在时把 total_seconds 改为 on_conflict(excluded) 的值。
+
+    一条 INSERT ... ON CONFLICT DO UPDATE 完成，两个请求同时写入同一个新行时不会违反唯一约束。
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f'按日汇总表不支持 {dialect} 数据库')
+    stmt = insert(DailyStudyRollup).values(user_id=user_id, subject_id=subject_id, day=day, total_seconds=total_seconds)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id', 'subject_id', 'day'],
+        set_={'total_seconds': on_conflict(stmt.excluded)}
+    ))
+
+
+def add_to_rollup(user_id, subject_id, creation_time, delta_seconds):
+    """把一次会话的时长增量累加到 (用户, 科目, 日期) 汇总行，调用方负责提交事务。"""
+    _upsert_rollup(user_id, subject_id, creation_time.date(), delta_seconds,
+                   lambda excluded: DailyStudyRollup.total_seconds + excluded.total_seconds)
+
+
+def refresh_rollup_day(user_id, subject_id, creation_time):
+    """用一条 INSERT ... VALUES ((SELECT SUM(...))) ON CONFLICT DO UPDATE 重新计算某个汇总行，调用方负责提交事务。
+
+    与增量累加不同，重新计算的结果不依赖调用方读到的旧值，适合并发的会话状态转换。
+    """
+    day_start = datetime.datetime.combine(creation_time.date(), datetime.time())
+    sessions = _all_sessions()
+    total = db.session.query(
+        func.coalesce(func.sum(func.coalesce(sessions.c.accumulated_seconds, 0)), 0)
+    ).filter(
+        sessions.c.user_id == user_id,
+        sessions.c.subject_id == subject_id,
+        sessions.c.creation_time >= day_start,
+        sessions.c.creation_time < day_start + datetime.timedelta(days=1)
+    ).scalar_subquery()
+    _upsert_rollup(user_id, subject_id, day_start.date(), total, lambda excluded: excluded.total_seconds)
+
+
+def refresh_rollup_window(user_id, subject_ids, first_day, last_day):
+    """用一条 DELETE 加一条 INSERT ... SELECT 重新计算某用户若干科目在 [first_day, last_day] 内的汇总行，
+    调用方负责提交事务。适合一次改动了大量会话的批量操作。"""
+    if not subject_ids:
+        return
+    subject_ids = list(subject_ids)
+    DailyStudyRollup.query.filter(
+        DailyStudyRollup.user_id == user_id,
+        DailyStudyRollup.subject_id.in_(subject_ids),
+        DailyStudyRollup.day >= first_day,
+        DailyStudyRollup.day <= last_day
+    ).delete(synchronize_session=False)
+    start = datetime.datetime.combine(first_day, datetime.time())
+    sessions = _all_sessions()
+    source = db.session.query(
+        sessions.c.user_id,
+        sessions.c.subject_id,
+        func.date(sessions.c.creation_time),
+        func.sum(func.coalesce(sessions.c.accumulated_seconds, 0))
+    ).filter(
+        sessions.c.user_id == user_id,
+        sessions.c.subject_id.in_(subject_ids),
+        sessions.c.creation_time >= start,
+        sessions.c.creation_time < datetime.datetime.combine(last_day, datetime.time()) + datetime.timedelta(days=1)
+    ).group_by(
+        sessions.c.user_id, sessions.c.subject_id, func.date(sessions.c.creation_time)
+    )
+    db.session.execute(
+        db.insert(DailyStudyRollup).from_select(
+            ['user_id', 'subject_id', 'day', 'total_seconds'], source
+        )
+    )
+
+
+def _raw_daily_totals():
+    """直接从原始记录（含归档会话）按 (用户, 科目, 日期) 聚合。"""
+    sessions = _all_sessions()
+    rows = db.session.query(
+        sessions.c.user_id,
+        sessions.c.subject_id,
+        func.date(sessions.c.creation_time),
+        func.sum(func.coalesce(sessions.c.accumulated_seconds, 0))
+    ).group_by(
+        sessions.c.user_id, sessions.c.subject_id, func.date(sessions.c.creation_time)
+    ).all()
+    return {(u, s, str(d)): int(total or 0) for u, s, d, total in rows}
+
+
+def _rollup_daily_totals():
+    rows = db.session.query(
+        DailyStudyRollup.user_id, DailyStudyRollup.subject_id, DailyStudyRollup.day, DailyStudyRollup.total_seconds
+    ).all()
+    return {(u, s, str(d)): int(total or 0) for u, s, d, total in rows}
+
+
+def diff_rollup():
+    """返回汇总表与原始记录不一致的条目列表：[(key, 汇总值, 原始值), ...]。"""
+    raw = _raw_daily_totals()
+    rollup = _rollup_daily_totals()
+    mismatches = []
+    for key in sorted(set(raw) | set(rollup)):
+        raw_total, rollup_total = raw.get(key, 0), rollup.get(key, 0)
+        if raw_total != rollup_total:
+            mismatches.append((key, rollup_total, raw_total))
+    return mismatches
+
+
+def rebuild_rollup(bump_versions=True):
+    """清空汇总表并用一条 INSERT ... SELECT 从原始记录重新生成，返回写入的行数。
+
+    迁移 1 回填时 user 表可能还没有 data_version 列（由迁移 4 添加），此时传入 bump_versions=False。
+    """
+    DailyStudyRollup.query.delete(synchronize_session=False)
+    sessions = _all_sessions()
+    source = db.session.query(
+        sessions.c.user_id,
+        sessions.c.subject_id,
+        func.date(sessions.c.creation_time),
+        func.sum(func.coalesce(sessions.c.accumulated_seconds, 0))
+    ).group_by(
+        sessions.c.user_id, sessions.c.subject_id, func.date(sessions.c.creation_time)
+    )
+    db.session.execute(
+        db.insert(DailyStudyRollup).from_select(
+            ['user_id', 'subject_id', 'day', 'total_seconds'], source
+        )
+    )
+    # 重建可能改变任意用户的统计结果
+    if bump_versions:
+        dataversion.bump_all()
+    db.session.commit()
+    return DailyStudyRollup.query.count()
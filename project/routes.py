@@ -1,12 +1,32 @@
-from flask import render_template, flash, redirect, url_for, request, jsonify, Blueprint
+from flask import render_template, flash, redirect, url_for, request, jsonify, Blueprint, Response, stream_with_context, current_app
 from flask_login import login_user, logout_user, current_user, login_required
-from sqlalchemy import func
+from sqlalchemy import func, or_, and_
 from project import db
-from project.models import User, StudySession, Subject
+from project.models import User, StudySession, ArchivedStudySession, Subject, DailyStudyRollup
 from project.forms import LoginForm, RegistrationForm
+from project.rollup import add_to_rollup, diff_rollup, rebuild_rollup
+from project.countdown import calculate_and_format_time
+from project import events
+from project import transfer
+from project import cache
+from project import session_state
+from project import dataversion
+from project import batch
+from project import passwords
+from project import segments
+from project import analytics
+from project import dateranges
+import click
 import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import time
+import base64
+import binascii
+import io
+import json
 
-bp = Blueprint('routes', __name__)
+# 命令行命令注册在 manage 组下（flask manage <命令>）：默认的组名 routes 与 Flask 内置的 `flask routes` 冲突，无法调用
+bp = Blueprint('routes', __name__, cli_group='manage')
 
 # --- 用户认证路由 (无变化) ---
 @bp.route('/register', methods=['GET', 'POST'])
@@ -15,7 +35,12 @@ def register():
     form = RegistrationForm()
     if form.validate_on_submit():
         user = User(username=form.username.data)
-        user.set_password(form.password.data)
+        try:
+            # 哈希交给进程池计算，不占用当前 worker 的 CPU
+            user.password_hash = passwords.service.hash(form.password.data)
+        except passwords.HashServiceBusy:
+            flash('注册请求过多，请稍后再试', 'danger')
+            return render_template('register.html', title='注册', form=form), 503
         db.session.add(user)
         db.session.commit()
         flash('恭喜，您已成功注册！', 'success')
@@ -27,10 +52,29 @@ def login():
     if current_user.is_authenticated: return redirect(url_for('routes.index'))
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data).first()
-        if user is None or not user.check_password(form.password.data):
+        username = form.username.data
+        # 先限流再哈希，暴力尝试不会消耗哈希进程池
+        if not passwords.allow_attempt(request.remote_addr, username):
+            flash('登录尝试过于频繁，请稍后再试', 'danger')
+            return render_template('login.html', title='登录', form=form), 429
+        user = User.query.filter_by(username=username).first()
+        try:
+            valid = user is not None and passwords.service.verify(user.password_hash, form.password.data)
+        except passwords.HashServiceBusy:
+            flash('登录请求过多，请稍后再试', 'danger')
+            return render_template('login.html', title='登录', form=form), 503
+        if not valid:
+            passwords.record_failure(request.remote_addr, username)
             flash('无效的用户名或密码', 'danger')
             return redirect(url_for('routes.login'))
+        passwords.reset_failures(username)
+        if passwords.service.needs_rehash(user.password_hash):
+            # 哈希参数已调整：趁持有明文密码时按新参数重新计算，繁忙时留到下次登录
+            try:
+                user.password_hash = passwords.service.hash(form.password.data)
+                db.session.commit()
+            except passwords.HashServiceBusy:
+                pass
         login_user(user, remember=form.remember_me.data)
         next_page = request.args.get('next')
         if not next_page or not next_page.startswith('/'):
@@ -47,13 +91,35 @@ def logout():
 @bp.route('/')
 @login_required
 def index():
-    total_seconds, days, hours, minutes, seconds, total_effective_hours = calculate_and_format_time()
+    target_datetime, effective_start_hour, effective_end_hour = current_user.countdown_settings()
+    total_seconds, days, hours, minutes, seconds, total_effective_hours = calculate_and_format_time(target_datetime, effective_start_hour, effective_end_hour)
     active_session = StudySession.query.filter(
         StudySession.user_id == current_user.id,
         StudySession.status.in_(['active', 'paused'])
     ).first()
-    subjects = current_user.subjects.order_by(Subject.name).all()
-    return render_template('index.html', total_seconds=total_seconds, days=days, hours=hours, minutes=minutes, seconds=seconds, total_effective_hours=total_effective_hours, active_session_data=active_session.to_dict() if active_session else None, subjects=[s.to_dict() for s in subjects])
+    subjects = _subject_list(current_user.id)
+    return render_template('index.html', total_seconds=total_seconds, days=days, hours=hours, minutes=minutes, seconds=seconds, total_effective_hours=total_effective_hours, active_session_data=active_session.to_dict() if active_session else None, subjects=subjects, target_datetime=target_datetime, effective_start_hour=effective_start_hour, effective_end_hour=effective_end_hour)
+
+# --- 新增：修改倒计时设置 ---
+@bp.route('/countdown_settings', methods=['POST'])
+@login_required
+def update_countdown_settings():
+    data = request.get_json()
+    try:
+        # 目标时间按本地时间 YYYY-MM-DDTHH:MM 提交，精确到分钟
+        target_datetime = datetime.datetime.fromisoformat(data.get('target')).replace(second=0, microsecond=0, tzinfo=None)
+        effective_start_hour = int(data.get('effective_start_hour'))
+        effective_end_hour = int(data.get('effective_end_hour'))
+    except (ValueError, TypeError):
+        return jsonify({'error': '无效的倒计时设置'}), 400
+    if not 0 <= effective_start_hour < effective_end_hour <= 24:
+        return jsonify({'error': '每日有效时段必须满足 0 <= 开始 < 结束 <= 24'}), 400
+    current_user.countdown_target = target_datetime
+    current_user.effective_start_hour = effective_start_hour
+    current_user.effective_end_hour = effective_end_hour
+    db.session.commit()
+    cache.invalidate_user(current_user.id)
+    return jsonify({'message': '倒计时设置已更新'}), 200
 
 # --- 学习记录页面 (已更新) ---
 @bp.route('/history')
@@ -65,128 +131,287 @@ def history():
 # --- 新增：获取学习数据的API ---
 @bp.route('/get_study_data')
 @login_required
+@dataversion.conditional
 def get_study_data():
-    # 接收两种可能的参数
-    start_date_str = request.args.get('start_date')
-    end_date_str = request.args.get('end_date')
-    start_date_utc_str = request.args.get('start_date_utc')
-    end_date_utc_str = request.args.get('end_date_utc')
-
-    base_query = StudySession.query.filter(StudySession.user_id == current_user.id)
-    filtered_sessions_query = base_query
-    
-    start_date_utc, end_date_utc = None, None
-
-    # 优先处理来自“今日”的精确UTC时间范围
-    if start_date_utc_str and end_date_utc_str:
-        try:
-            # Python 3.7+ can parse 'Z' with a simple replace
-            start_date_utc = datetime.datetime.fromisoformat(start_date_utc_str.replace('Z', '+00:00'))
-            end_date_utc = datetime.datetime.fromisoformat(end_date_utc_str.replace('Z', '+00:00'))
-        except ValueError:
-            return jsonify({'error': '无效的UTC日期格式'}), 400
-    
-    # 否则，处理来自日期选择器的 YYYY-MM-DD 格式
-    elif start_date_str:
-        try:
-            start_date_utc = datetime.datetime.strptime(start_date_str, '%Y-%m-%d')
-            end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d') if end_date_str else start_date_utc
-            end_date_utc = end_date + datetime.timedelta(days=1)
-        except ValueError:
-            return jsonify({'error': '无效的日期格式'}), 400
+    # 只返回图表数据，会话明细改由 /sessions 分页获取
+    try:
+        start_date_utc, end_date_utc, _ = dateranges.parse_date_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    # 如果有任何一种日期范围，就应用筛选
     if start_date_utc and end_date_utc:
-        filtered_sessions_query = base_query.filter(
-            StudySession.creation_time >= start_date_utc, 
-            StudySession.creation_time < end_date_utc
-        )
+        # “今日”的精确UTC区间和日期选择器的整天区间口径相同：按学习区间截取，跨午夜的会话只计入区间内的部分
+        # （汇总表按会话创建日期归档，会把整个会话计入开始的那天，只适合不筛选日期的合计）
+        totals = segments.totals_by_subject(current_user.id, start_date_utc, end_date_utc)
+        chart_data = [{'subject': name, 'duration': round(total)} for name, total in sorted(totals.items()) if total > 0]
+        return jsonify({'chart_data': chart_data})
 
-    sessions = filtered_sessions_query.order_by(StudySession.creation_time.desc()).all()
-    
+    # 全部记录：从汇总表读取，避免扫描全部会话
     chart_query = db.session.query(
         Subject.name,
-        func.sum(StudySession.accumulated_seconds).label('total_seconds')
-    ).join(Subject).filter(
-        StudySession.user_id == current_user.id
+        func.sum(DailyStudyRollup.total_seconds).label('total_seconds')
+    ).join(Subject, Subject.id == DailyStudyRollup.subject_id).filter(
+        DailyStudyRollup.user_id == current_user.id
     )
-
-    # 对图表数据也应用同样的日期筛选
-    if start_date_utc and end_date_utc:
-         chart_query = chart_query.filter(
-            StudySession.creation_time >= start_date_utc, 
-            StudySession.creation_time < end_date_utc
-        )
-
     chart_data = [{'subject': name, 'duration': total} for name, total in chart_query.group_by(Subject.name).all() if total and total > 0]
     
-    detailed_sessions = [{
-        'id': s.id,
-        'subject': s.subject.name,
-        'creation_time': s.creation_time.strftime('%Y-%m-%d %H:%M:%S'),
-        'end_time': s.end_time.strftime('%Y-%m-%d %H:%M:%S') if s.end_time else '进行中',
-        'accumulated_seconds': s.accumulated_seconds
-    } for s in sessions]
+    return jsonify({'chart_data': chart_data})
+
+# --- 新增：按用户时区统计每天、每小时的学习时长 ---
+ANALYTICS_MAX_DAYS = 366
+
+@bp.route('/analytics/intervals')
+@login_required
+@dataversion.conditional
+def analytics_intervals():
+    """参数 start_date/end_date（YYYY-MM-DD，用户本地日期）和 tz（IANA 时区名，默认 UTC）。"""
+    tz_name = request.args.get('tz') or 'UTC'
+    try:
+        ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return jsonify({'error': '无效的时区'}), 400
+    try:
+        first_day = datetime.date.fromisoformat(request.args['start_date'])
+        last_day = datetime.date.fromisoformat(request.args.get('end_date') or request.args['start_date'])
+    except KeyError:
+        return jsonify({'error': '缺少 start_date 参数'}), 400
+    except ValueError:
+        return jsonify({'error': '无效的日期格式'}), 400
+    if last_day < first_day:
+        return jsonify({'error': '结束日期不能早于开始日期'}), 400
+    if (last_day - first_day).days >= ANALYTICS_MAX_DAYS:
+        return jsonify({'error': f'日期范围最多 {ANALYTICS_MAX_DAYS} 天'}), 400
+    return jsonify(segments.local_breakdown(current_user.id, first_day, last_day, tz_name))
+
+def _utc_today():
+    return datetime.datetime.utcnow().date().isoformat()
+
+@bp.route('/analytics/summary')
+@login_required
+# 缺省的截止日期随 UTC 日期变化，计入 ETag，过了午夜不会再命中前一天的 304
+@dataversion.conditional(vary=lambda: '' if request.args.get('end_date') else _utc_today())
+def analytics_summary():
+    """连续天数、热力图、滚动平均和科目趋势。end_date 为截止的 UTC 日期（YYYY-MM-DD），默认今天。"""
+    try:
+        end_day = datetime.date.fromisoformat(request.args.get('end_date') or _utc_today())
+    except ValueError:
+        return jsonify({'error': '无效的日期格式'}), 400
+    try:
+        return jsonify(analytics.summary(current_user.id, end_day))
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+
+# --- 新增：按游标分页的会话明细API ---
+SESSIONS_PAGE_SIZE = 50
+SESSIONS_MAX_PAGE_SIZE = 500
+
+def _encode_cursor(creation_time, session_id):
+    raw = f"{creation_time.isoformat()}|{session_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    creation_time_str, session_id = raw.split('|')
+    return datetime.datetime.fromisoformat(creation_time_str), int(session_id)
+
+def _session_row_to_dict(row):
+    return {
+        'id': row.id,
+        'subject': row.subject_name,
+        'creation_time': row.creation_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'end_time': row.end_time.strftime('%Y-%m-%d %H:%M:%S') if row.end_time else '进行中',
+        'accumulated_seconds': row.accumulated_seconds,
+        'archived': bool(row.archived),
+        'auto_closed': bool(row.auto_closed)
+    }
+
+@bp.route('/sessions')
+@login_required
+def list_sessions():
+    """按 (creation_time, id) 倒序的键集分页；format=ndjson 时以流的形式逐行返回全部结果。"""
+    try:
+        start_date_utc, end_date_utc, _ = dateranges.parse_date_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # format=ndjson 时返回全部结果，不使用游标
+    cursor = request.args.get('cursor') if request.args.get('format') != 'ndjson' else None
+    if cursor:
+        try:
+            cursor_time, cursor_id = _decode_cursor(cursor)
+        except (ValueError, binascii.Error):
+            return jsonify({'error': '无效的分页游标'}), 400
+
+    def branch(model, archived):
+        # 一次 JOIN 取出科目名称，避免逐行懒加载 subject；筛选条件放在 UNION ALL 的每个分支内，各自走索引
+        query = db.select(
+            model.id.label('id'),
+            Subject.name.label('subject_name'),
+            model.creation_time.label('creation_time'),
+            model.end_time,
+            model.accumulated_seconds,
+            model.auto_closed,
+            db.literal(archived).label('archived')
+        ).join(Subject, Subject.id == model.subject_id).where(model.user_id == current_user.id)
+        if start_date_utc and end_date_utc:
+            query = query.where(model.creation_time >= start_date_utc, model.creation_time < end_date_utc)
+        if cursor:
+            query = query.where(or_(
+                model.creation_time < cursor_time,
+                and_(model.creation_time == cursor_time, model.id < cursor_id)
+            ))
+        return query
+
+    # 归档会话与在用会话的ID互不重复，合并后按同一个键排序，以只读记录的形式列出
+    query = db.union_all(branch(StudySession, False), branch(ArchivedStudySession, True))
+    query = query.order_by(query.selected_columns.creation_time.desc(), query.selected_columns.id.desc())
+
+    if request.args.get('format') == 'ndjson':
+        def generate():
+            for row in db.session.execute(query, execution_options={'yield_per': 500}):
+                yield json.dumps(_session_row_to_dict(row), ensure_ascii=False) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    limit = request.args.get('limit', SESSIONS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, SESSIONS_MAX_PAGE_SIZE))
+    # 多取一行用于判断是否还有下一页
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    next_cursor = _encode_cursor(rows[limit - 1].creation_time, rows[limit - 1].id) if len(rows) > limit else None
 
     return jsonify({
-        'chart_data': chart_data,
-        'sessions': detailed_sessions
+        'sessions': [_session_row_to_dict(row) for row in rows[:limit]],
+        'next_cursor': next_cursor
     })
 
+# --- 新增：实时推送当前用户的会话与科目变化 ---
+def _format_sse(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@bp.route('/events')
+@login_required
+def stream_events():
+    """Server-Sent Events 流。需在 gevent 等异步 worker 下运行，否则每个连接会占用一个同步 worker，
+    因此未开启 LIVE_UPDATES_ENABLED 时直接返回 404。"""
+    if not current_app.config['LIVE_UPDATES_ENABLED']:
+        return jsonify({'error': '未开启实时推送'}), 404
+    user_id = current_user.id
+    last_id = request.headers.get('Last-Event-ID') or events.broker.latest_id(user_id)
+    heartbeat = current_app.config['EVENTS_HEARTBEAT_SECONDS']
+
+    def generate():
+        nonlocal last_id
+        yield 'retry: 3000\n\n'
+        while True:
+            pending = events.broker.wait(user_id, last_id, heartbeat)
+            if not pending:
+                yield ': keep-alive\n\n'
+            for event_id, event_type, data in pending:
+                last_id = event_id
+                yield _format_sse(event_id, event_type, data)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/events/poll')
+@login_required
+def poll_events():
+    """长轮询兜底：不带 last_id 时立即返回当前游标，之后带上游标等待新事件。
+
+    未开启 LIVE_UPDATES_ENABLED（同步 worker）时不等待，立即返回已有的新事件，由页面定时轮询。
+    """
+    last_id = request.args.get('last_id')
+    if not last_id:
+        return jsonify({'last_id': events.broker.latest_id(current_user.id), 'events': []})
+    timeout = current_app.config['EVENTS_POLL_TIMEOUT_SECONDS'] if current_app.config['LIVE_UPDATES_ENABLED'] else 0
+    pending = events.broker.wait(current_user.id, last_id, timeout)
+    return jsonify({
+        'last_id': pending[-1][0] if pending else last_id,
+        'events': [{'type': event_type, 'data': data} for _, event_type, data in pending]
+    })
+
+# --- 新增：批量导入/导出学习记录 ---
+TRANSFER_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+@bp.route('/export_sessions')
+@login_required
+def export_sessions():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in TRANSFER_FORMATS: return jsonify({'error': '不支持的格式'}), 400
+    return Response(
+        stream_with_context(transfer.export_lines(current_user.id, fmt)),
+        mimetype=TRANSFER_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename=study_sessions.{fmt}'}
+    )
+
+@bp.route('/import_sessions', methods=['POST'])
+@login_required
+def import_sessions():
+    """接受 multipart 上传的 file 字段，或直接以请求体发送的文件内容，边读边写入。"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in TRANSFER_FORMATS: return jsonify({'error': '不支持的格式'}), 400
+    upload = request.files.get('file')
+    raw_stream = upload.stream if upload else request.stream
+    text_stream = io.TextIOWrapper(raw_stream, encoding='utf-8-sig', newline='')
+    stats = transfer.import_sessions(current_user.id, transfer.read_rows(text_stream, fmt))
+    if stats['subjects_created']:
+        _subjects_changed()
+    return jsonify(stats), 400 if 'error' in stats else 200
+
 # --- 其他API路由和后台逻辑 (无变化) ---
 @bp.route('/start_session', methods=['POST'])
 @login_required
 def start_session():
-    if StudySession.query.filter(StudySession.user_id == current_user.id, StudySession.status.in_(['active', 'paused'])).first():
-        return jsonify({'error': '已有正在进行的学习会话'}), 400
     data = request.get_json()
     subject_id = data.get('subject_id')
     if not subject_id: return jsonify({'error': '请选择一个科目'}), 400
-    subject = Subject.query.filter_by(id=subject_id, user_id=current_user.id).first()
-    if not subject: return jsonify({'error': '选择的科目无效'}), 404
-    now = datetime.datetime.utcnow()
-    new_session = StudySession(subject_id=subject.id, author=current_user, status='active', last_start_time=now)
-    db.session.add(new_session)
-    db.session.commit()
+    try:
+        new_session = session_state.start(current_user.id, subject_id)
+    except session_state.TransitionError as e:
+        return jsonify({'error': e.message}), e.status_code
+    events.publish(current_user.id, 'session', {'session': new_session.to_dict()})
     return jsonify({'message': 'Session started', 'session': new_session.to_dict()}), 201
 
 @bp.route('/toggle_pause_session', methods=['POST'])
 @login_required
 def toggle_pause_session():
-    session = StudySession.query.filter(StudySession.user_id == current_user.id, StudySession.status.in_(['active', 'paused'])).first()
-    if not session: return jsonify({'error': 'No active session found'}), 404
-    now = datetime.datetime.utcnow()
-    if session.status == 'active':
-        elapsed = (now - session.last_start_time).total_seconds()
-        session.accumulated_seconds += int(elapsed)
-        session.status = 'paused'
-        session.last_start_time = None
-    elif session.status == 'paused':
-        session.status = 'active'
-        session.last_start_time = now
-    db.session.commit()
+    # 可选的 action（pause/resume）让重复提交的同一操作只生效一次
+    action = (request.get_json(silent=True) or {}).get('action')
+    if action not in (None, 'pause', 'resume'): return jsonify({'error': '无效的操作'}), 400
+    try:
+        session = session_state.toggle(current_user.id, action)
+    except session_state.TransitionError as e:
+        return jsonify({'error': e.message}), e.status_code
+    events.publish(current_user.id, 'session', {'session': session.to_dict()})
     return jsonify({'message': f'Session {session.status}', 'session': session.to_dict()}), 200
 
 @bp.route('/stop_session', methods=['POST'])
 @login_required
 def stop_session():
-    session = StudySession.query.filter(StudySession.user_id == current_user.id, StudySession.status.in_(['active', 'paused'])).first()
-    if not session: return jsonify({'error': 'No active session found'}), 404
-    now = datetime.datetime.utcnow()
-    if session.status == 'active':
-        elapsed = (now - session.last_start_time).total_seconds()
-        session.accumulated_seconds += int(elapsed)
-    session.status = 'completed'
-    session.end_time = now
-    session.last_start_time = None
-    db.session.commit()
+    try:
+        session_state.stop(current_user.id)
+    except session_state.TransitionError as e:
+        return jsonify({'error': e.message}), e.status_code
+    events.publish(current_user.id, 'session', {'session': None})
     return jsonify({'message': 'Session stopped'}), 200
 
+def _subject_list(user_id):
+    """按名称排序的科目列表（dict），带缓存，科目增删改时失效。"""
+    key = cache.subjects_key(user_id)
+    subjects = cache.get(key)
+    if subjects is None:
+        subjects = [s.to_dict() for s in Subject.query.filter_by(user_id=user_id).order_by(Subject.name)]
+        cache.set(key, subjects)
+    return subjects
+
+def _subjects_changed():
+    cache.invalidate_subjects(current_user.id)
+    events.publish(current_user.id, 'subjects', _subject_list(current_user.id))
+
 @bp.route('/subjects', methods=['GET'])
 @login_required
+@dataversion.conditional
 def get_subjects():
-    subjects = current_user.subjects.order_by(Subject.name).all()
-    return jsonify([s.to_dict() for s in subjects])
+    return jsonify(_subject_list(current_user.id))
 
 @bp.route('/add_subject', methods=['POST'])
 @login_required
@@ -198,7 +423,9 @@ def add_subject():
         return jsonify({'error': '该科目已存在'}), 400
     new_subject = Subject(name=name, author=current_user)
     db.session.add(new_subject)
+    dataversion.bump(current_user.id)
     db.session.commit()
+    _subjects_changed()
     return jsonify(new_subject.to_dict()), 201
 
 @bp.route('/update_subject/<int:subject_id>', methods=['POST'])
@@ -212,7 +439,9 @@ def update_subject(subject_id):
     if name != subject.name and Subject.query.filter_by(user_id=current_user.id, name=name).first():
         return jsonify({'error': '该科目已存在'}), 400
     subject.name = name
+    dataversion.bump(current_user.id)
     db.session.commit()
+    _subjects_changed()
     return jsonify(subject.to_dict())
 
 @bp.route('/delete_subject/<int:subject_id>', methods=['POST'])
@@ -220,9 +449,15 @@ def update_subject(subject_id):
 def delete_subject(subject_id):
     subject = Subject.query.get_or_404(subject_id)
     if subject.user_id != current_user.id: return jsonify({'error': '无权删除'}), 403
-    if subject.study_sessions.first(): return jsonify({'error': '该科目下已有学习记录，无法删除'}), 400
+    if StudySession.query.filter_by(user_id=current_user.id, subject_id=subject.id).first() or \
+            ArchivedStudySession.query.filter_by(user_id=current_user.id, subject_id=subject.id).first():
+        return jsonify({'error': '该科目下已有学习记录（含已归档的记录），无法删除'}), 400
+    # 科目下的会话都已删除，残留的汇总行（时长为 0）随科目一起删除
+    DailyStudyRollup.query.filter_by(user_id=current_user.id, subject_id=subject.id).delete(synchronize_session=False)
     db.session.delete(subject)
+    dataversion.bump(current_user.id)
     db.session.commit()
+    _subjects_changed()
     return jsonify({'message': '删除成功'})
 
 @bp.route('/delete_sessions', methods=['POST'])
@@ -230,11 +465,23 @@ def delete_subject(subject_id):
 def delete_sessions():
     data = request.get_json(); session_ids = data.get('session_ids')
     if not session_ids: return jsonify({'error': '未提供会话ID'}), 400
-    sessions_to_delete = StudySession.query.filter(StudySession.user_id == current_user.id, StudySession.id.in_(session_ids)).all()
-    if not sessions_to_delete: return jsonify({'error': '没有找到可删除的会话'}), 404
-    for session in sessions_to_delete: db.session.delete(session)
-    db.session.commit()
-    return jsonify({'message': f'成功删除了 {len(sessions_to_delete)} 条记录'}), 200
+    try:
+        result, = batch.apply(current_user.id, [{'op': 'delete', 'session_ids': session_ids}])
+    except batch.BatchError as e:
+        return jsonify({'error': e.results[0]['error'] if e.results else e.message}), 400
+    if not result['affected']: return jsonify({'error': '没有找到可删除的会话'}), 404
+    return jsonify({'message': f"成功删除了 {result['affected']} 条记录"}), 200
+
+# --- 新增：批量编辑API，多个操作在一个事务内以集合式 DELETE/UPDATE 执行 ---
+@bp.route('/sessions/batch', methods=['POST'])
+@login_required
+def batch_sessions():
+    operations = (request.get_json(silent=True) or {}).get('operations')
+    try:
+        results = batch.apply(current_user.id, operations)
+    except batch.BatchError as e:
+        return jsonify({'error': e.message, 'results': e.results}), 400
+    return jsonify({'results': results, 'affected': sum(r['affected'] for r in results)}), 200
 
 @bp.route('/modify_session/<int:session_id>', methods=['POST'])
 @login_required
@@ -247,113 +494,191 @@ def modify_session(session_id):
         if new_duration_seconds < 0: raise ValueError("Duration cannot be negative.")
     except (ValueError, TypeError):
         return jsonify({'error': '无效的时长格式'}), 400
+    add_to_rollup(session.user_id, session.subject_id, session.creation_time, new_duration_seconds - (session.accumulated_seconds or 0))
     session.accumulated_seconds = new_duration_seconds
     session.end_time = session.creation_time + datetime.timedelta(seconds=new_duration_seconds)
+    session.auto_closed = False
+    segments.replace_segments([session.id], [(session.id, session.user_id, session.creation_time, session.end_time)])
+    dataversion.bump(current_user.id)
     db.session.commit()
     return jsonify({'message': '记录已更新'}), 200
 
-def calculate_and_format_time():
-    target_datetime = datetime.datetime(2025, 12, 20, 8, 30)
-    effective_start_hour, effective_end_hour = 8, 22
-    effective_hours_per_day = effective_end_hour - effective_start_hour
-    now = datetime.datetime.now()
-    if now >= target_datetime: return 0, 0, '00', '00', '00', '0.0'
-    total_effective_seconds = 0; current_day = now.date()
-    while current_day <= target_datetime.date():
-        day_effective_start = datetime.datetime.combine(current_day, datetime.time(effective_start_hour, 0))
-        day_effective_end = datetime.datetime.combine(current_day, datetime.time(effective_end_hour, 0))
-        actual_start = max(now, day_effective_start); actual_end = min(target_datetime, day_effective_end)
-        if actual_start < actual_end: total_effective_seconds += (actual_end - actual_start).total_seconds()
-        current_day += datetime.timedelta(days=1)
-    seconds_in_effective_day = effective_hours_per_day * 3600
-    days = int(total_effective_seconds // seconds_in_effective_day)
-    remaining_seconds_after_days = total_effective_seconds % seconds_in_effective_day
-    hours = int(remaining_seconds_after_days // 3600)
-    remaining_seconds_after_hours = remaining_seconds_after_days % 3600
-    minutes = int(remaining_seconds_after_hours // 60)
-    seconds = int(remaining_seconds_after_hours % 60)
-    formatted_hours = str(hours).zfill(2); formatted_minutes = str(minutes).zfill(2); formatted_seconds = str(seconds).zfill(2)
-    total_effective_hours = total_effective_seconds / 3600
-    formatted_total_hours = f"{total_effective_hours:,.1f}"
-    return int(total_effective_seconds), days, formatted_hours, formatted_minutes, formatted_seconds, formatted_total_hours
-
-
 # --- 新增：数据库检验CLI命令 ---
 
 @bp.cli.command("verify-db")
-def verify_db():
+@click.option('--fix', is_flag=True, help='分批修复可自动修复的错误')
+@click.option('--json', 'as_json', is_flag=True, help='以 JSON 格式输出检验报告')
+@click.option('--jobs', default=4, show_default=True, help='并行执行检验的线程数')
+@click.option('--max-samples', default=20, show_default=True, help='每项检验最多列出的错误行数')
+def verify_db(fix, as_json, jobs, max_samples):
     """检验数据库中的数据是否存在差错。"""
+    from project.integrity import verify
+    if as_json:
+        print(json.dumps(verify(fix=fix, jobs=jobs, max_samples=max_samples), ensure_ascii=False, indent=2))
+        return
+
     print("--- 开始检验数据库数据 ---")
-    errors_found = 0
-    
-    # 1. 检验学习会话 (StudySession)
-    print("\n[+] 正在检验 StudySession 表...")
-    all_sessions = StudySession.query.all()
-    for session in all_sessions:
-        # 检查逻辑错误：时长为负
-        if session.accumulated_seconds < 0:
-            print(f"  [错误] Session ID {session.id}: 累计时长 (accumulated_seconds) 为负数: {session.accumulated_seconds}")
-            errors_found += 1
-            
-        # 检查逻辑错误：结束时间早于创建时间
-        if session.end_time and session.end_time < session.creation_time:
-            print(f"  [错误] Session ID {session.id}: 结束时间 (end_time) 早于创建时间 (creation_time)。")
-            errors_found += 1
-            
-        # 检查状态不一致：活动状态但没有 last_start_time
-        if session.status == 'active' and not session.last_start_time:
-            print(f"  [错误] Session ID {session.id}: 状态为 'active' 但 last_start_time 为空。")
-            errors_found += 1
-
-        # 检查状态不一致：非活动状态但有 last_start_time
-        if session.status != 'active' and session.last_start_time:
-            print(f"  [错误] Session ID {session.id}: 状态为 '{session.status}' 但 last_start_time 不为空。")
-            errors_found += 1
-            
-        # 检查外键关联：用户是否存在
-        if not session.author:
-            print(f"  [错误] Session ID {session.id}: 关联的用户 (user_id={session.user_id}) 不存在。")
-            errors_found += 1
-
-        # 检查外键关联：科目是否存在
-        if not session.subject:
-            print(f"  [错误] Session ID {session.id}: 关联的科目 (subject_id={session.subject_id}) 不存在。")
-            errors_found += 1
-
-    if not all_sessions:
-        print("  StudySession 表为空，无需检验。")
-
-    # 2. 检验科目 (Subject)
-    print("\n[+] 正在检验 Subject 表...")
-    all_subjects = Subject.query.all()
-    for subject in all_subjects:
-        # 检查科目名是否为空或仅有空格
-        if not subject.name or not subject.name.strip():
-            print(f"  [错误] Subject ID {subject.id}: 科目名称 (name) 为空。")
-            errors_found += 1
-            
-        # 检查外键关联：用户是否存在
-        if not subject.author:
-            print(f"  [错误] Subject ID {subject.id}: 关联的用户 (user_id={subject.user_id}) 不存在。")
-            errors_found += 1
-            
-    if not all_subjects:
-        print("  Subject 表为空，无需检验。")
-        
-    # 3. 检验用户 (User) - 可根据需要添加更多检查
-    print("\n[+] 正在检验 User 表...")
-    all_users = User.query.all()
-    for user in all_users:
-        if not user.username or not user.username.strip():
-            print(f"  [错误] User ID {user.id}: 用户名 (username) 为空。")
-            errors_found += 1
-
-    if not all_users:
-        print("  User 表为空，无需检验。")
+    report = verify(fix=fix, jobs=jobs, max_samples=max_samples,
+                    on_finding=lambda check, message: print(f"  [错误] {message}"))
+
+    print("\n--- 检验结果 ---")
+    for result in report['checks']:
+        line = f"  {result['table']}.{result['name']}: {result['count']} 条"
+        if result['count'] > len(result['samples']):
+            line += f"（仅列出前 {len(result['samples'])} 条）"
+        if result['fixed']:
+            line += f"，已修复 {result['fixed']} 条"
+        print(line)
 
     # --- 总结 ---
-    print("\n--- 检验完成 ---")
-    if errors_found == 0:
+    print(f"\n--- 检验完成（耗时 {report['seconds']}s）---")
+    if report['errors_found'] == 0:
         print("恭喜！未发现任何数据差错。")
+    elif fix:
+        print(f"共发现 {report['errors_found']} 个错误，已修复 {report['errors_fixed']} 个。")
+        if report['rollup_rebuilt']:
+            print("已根据修复后的数据重建按日汇总表。")
     else:
-        print(f"共发现 {errors_found} 个错误，请根据以上日志进行修复。")
\ No newline at end of file
+        print(f"共发现 {report['errors_found']} 个错误，可使用 --fix 自动修复。")
+
+
+@bp.cli.command("rebuild-rollup")
+def rebuild_rollup_command():
+    """从原始学习记录重建按日汇总表，并与原始记录逐项核对。"""
+    print("--- 开始重建按日汇总表 ---")
+    stale = diff_rollup()
+    if stale:
+        print(f"  [提示] 重建前汇总表有 {len(stale)} 项与原始记录不一致。")
+    rows = rebuild_rollup()
+    print(f"  已写入 {rows} 条汇总记录。")
+
+    mismatches = diff_rollup()
+    print("\n--- 核对完成 ---")
+    if not mismatches:
+        print("汇总表与原始记录完全一致。")
+    else:
+        for (user_id, subject_id, day), rollup_total, raw_total in mismatches:
+            print(f"  [错误] user_id={user_id}, subject_id={subject_id}, day={day}: 汇总 {rollup_total}s != 原始 {raw_total}s")
+        print(f"共发现 {len(mismatches)} 处不一致。")
+
+
+@bp.cli.command("migrate-db")
+def migrate_db():
+    """执行尚未执行的数据库迁移（补建索引、回填汇总表等）。"""
+    from project.migrations import upgrade
+    applied = upgrade()
+    if not applied:
+        print("数据库已是最新，无需迁移。")
+    for version, name in applied:
+        print(f"  已执行迁移 {version}: {name}")
+
+
+@bp.cli.command("compile-templates")
+def compile_templates_command():
+    """编译全部 Jinja 模板并写入字节码缓存（JINJA_BYTECODE_CACHE_DIR），部署时执行一次。"""
+    from project.templating import compile_templates
+    if not current_app.config['JINJA_BYTECODE_CACHE_DIR']:
+        raise click.ClickException('未设置 JINJA_BYTECODE_CACHE_DIR，编译结果无处保存')
+    if current_app.jinja_env.bytecode_cache is None:
+        raise click.ClickException(f"字节码缓存目录 {current_app.config['JINJA_BYTECODE_CACHE_DIR']} 不可用")
+    started = time.perf_counter()
+    names = compile_templates(current_app)
+    print(f"已编译 {len(names)} 个模板（耗时 {time.perf_counter() - started:.3f}s），缓存目录: {current_app.config['JINJA_BYTECODE_CACHE_DIR']}")
+
+
+@bp.cli.command("run-maintenance")
+@click.option('--stale-hours', type=int, help='覆盖 STALE_SESSION_MAX_HOURS（0 表示跳过）')
+@click.option('--archive-months', type=int, help='覆盖 ARCHIVE_AFTER_MONTHS（0 表示跳过）')
+def run_maintenance_command(stale_hours, archive_months):
+    """执行一次维护任务：自动结束被遗忘的会话、归档旧的已完成会话。适合由 cron 定期调用。"""
+    from project import maintenance
+    config = dict(current_app.config)
+    if stale_hours is not None:
+        config['STALE_SESSION_MAX_HOURS'] = stale_hours
+    if archive_months is not None:
+        config['ARCHIVE_AFTER_MONTHS'] = archive_months
+    started = time.perf_counter()
+    results = maintenance.run_all(config)
+    for job, count in results.items():
+        print(f"  {job}: {count} 条")
+    print(f"--- 维护完成（耗时 {time.perf_counter() - started:.3f}s）---")
+
+
+@bp.cli.command("import-sessions")
+@click.argument('path', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--user', 'username', required=True, help='导入到哪个用户名下')
+@click.option('--format', 'fmt', type=click.Choice(list(TRANSFER_FORMATS)), default='csv', show_default=True)
+@click.option('--chunk-size', default=transfer.IMPORT_CHUNK_SIZE, show_default=True, help='每批写入并提交的行数')
+def import_sessions_command(path, username, fmt, chunk_size):
+    """从 CSV/NDJSON 文件（- 表示标准输入）批量导入学习记录。"""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f'用户 {username} 不存在')
+    stats = transfer.import_sessions(user.id, transfer.read_rows(path, fmt), chunk_size)
+    if stats['subjects_created']:
+        cache.invalidate_subjects(user.id)
+    print(f"导入 {stats['imported']} 条，跳过 {stats['skipped']} 条，新建科目 {stats['subjects_created']} 个。")
+    for error in stats['errors']:
+        print(f"  [错误] {error}")
+    print(f"耗时 {stats['seconds']}s，吞吐量 {stats['rows_per_second']} 行/秒。")
+    if 'error' in stats:
+        raise click.ClickException(stats['error'])
+
+
+@bp.cli.command("export-sessions")
+@click.argument('path', type=click.File('w', encoding='utf-8'))
+@click.option('--user', 'username', required=True, help='导出哪个用户的记录')
+@click.option('--format', 'fmt', type=click.Choice(list(TRANSFER_FORMATS)), default='csv', show_default=True)
+def export_sessions_command(path, username, fmt):
+    """把学习记录流式导出为 CSV/NDJSON 文件（- 表示标准输出）。"""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f'用户 {username} 不存在')
+    started = time.perf_counter()
+    rows = 0
+    for line in transfer.export_lines(user.id, fmt):
+        path.write(line)
+        rows += line.count('\n')
+    if fmt == 'csv':
+        rows -= 1  # 表头
+    elapsed = time.perf_counter() - started
+    click.echo(f"导出 {rows} 条，耗时 {elapsed:.3f}s，吞吐量 {rows / elapsed if elapsed else 0:.1f} 行/秒。", err=True)
+
+
+@bp.cli.command("cache-stats")
+def cache_stats_command():
+    """显示用户/科目缓存的命中与未命中次数。"""
+    for key, value in cache.stats().items():
+        print(f"  {key}: {value}")
+
+
+@bp.cli.command("db-info")
+def db_info_command():
+    """显示当前的数据库配置档、连接池参数以及 SQLite 实际生效的 PRAGMA。"""
+    from sqlalchemy.engine import make_url
+    from project.engine import sqlite_settings
+    print(f"  profile: {current_app.config['DB_PROFILE']}")
+    print(f"  url: {make_url(current_app.config['SQLALCHEMY_DATABASE_URI']).render_as_string(hide_password=True)}")
+    print(f"  pool: {db.engine.pool.status()}")
+    if db.engine.dialect.name == 'sqlite':
+        for name, value in sqlite_settings().items():
+            print(f"  {name}: {value}")
+
+
+@bp.cli.command("build-assets")
+@click.option('--chartjs', 'chartjs_source', type=click.Path(exists=True, dir_okay=False),
+              help='使用本地的 Chart.js 文件（离线环境），默认从 CHARTJS_URL 下载一次')
+def build_assets_command(chartjs_source):
+    """生成背景图的 AVIF/WebP/JPEG 多尺寸版本，放入本地 Chart.js，并输出带指纹和预压缩副本的构建产物。"""
+    from project.assets import build_assets
+    config = current_app.config
+    try:
+        _, report = build_assets(
+            current_app.static_folder, config['ASSET_IMAGES'], config['ASSET_IMAGE_WIDTHS'],
+            {'vendor/chart.umd.js': (config['CHARTJS_URL'], chartjs_source)}
+        )
+    except (RuntimeError, OSError) as e:
+        raise click.ClickException(str(e))
+    for path, original, built in report:
+        print(f"  {path}: {original / 1024:.1f} KiB -> {built / 1024:.1f} KiB")
+    print("构建完成，重启应用后生效。")
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""学习区间（StudySegment）的写入与按时间段统计。
+
+会话状态转换时由 session_state 调用 open_segment/close_segment，与会话的 UPDATE 在同一事务中执行；
+会话行上的条件 UPDATE 已经把同一会话的并发转换串行化，因此每个会话最多只有一段未结束的区间。
+统计只计算已结束的区间，与 accumulated_seconds 的口径一致（正在计时的部分不计入）。
+"""
+import datetime
+from zoneinfo import ZoneInfo
+from sqlalchemy import insert, update, delete
+from project import db
+from project.models import StudySession, StudySegment, ArchivedStudySession, ArchivedStudySegment, Subject
+
+HOUR = datetime.timedelta(hours=1)
+
+
+def open_segment(session_id, user_id, now):
+    db.session.execute(insert(StudySegment).values(session_id=session_id, user_id=user_id, start_time=now))
+
+
+def close_segment(session_id, now):
+    db.session.execute(
+        update(StudySegment).where(StudySegment.session_id == session_id, StudySegment.end_time.is_(None)).values(end_time=now),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def replace_segments(session_ids, segments):
+    """删除这些会话原有的区间并写入新的区间 [(session_id, user_id, start, end), ...]。
+
+    用于手动修改时长、导入历史记录等无法得知真实区间的场景，调用方负责提交事务。
+    """
+    if session_ids:
+        db.session.execute(delete(StudySegment).where(StudySegment.session_id.in_(list(session_ids))),
+                           execution_options={'synchronize_session': False})
+    if segments:
+        db.session.execute(insert(StudySegment), [
+            {'session_id': sid, 'user_id': uid, 'start_time': start, 'end_time': end}
+            for sid, uid, start, end in segments
+        ])
+
+
+def delete_segments(session_filter, archived=False):
+    """删除满足会话条件（如用户 + 会话ID列表）的会话的所有区间；archived 为 True 时条件针对归档会话，删除归档区间。"""
+    segment, session = (ArchivedStudySegment, ArchivedStudySession) if archived else (StudySegment, StudySession)
+    db.session.execute(
+        delete(segment).where(segment.session_id.in_(db.select(session.id).where(*session_filter))),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def synthetic_segment(creation_time, end_time, accumulated_seconds):
+    """没有真实区间时，用以结束时间为终点、长度为累计时长的一段近似。"""
+    duration = datetime.timedelta(seconds=max(0, accumulated_seconds or 0))
+    end = end_time or creation_time + duration
+    return end - duration, end
+
+
+def overlapping_segments(user_id, start, end):
+    """返回与 [start, end) 重叠的已结束区间 [(开始, 结束, 科目名称), ...]（含归档区间），时间均为无时区的 UTC。"""
+    return db.session.execute(db.union_all(*(
+        db.select(segment.start_time, segment.end_time, Subject.name).join(
+            session, session.id == segment.session_id
+        ).join(Subject, Subject.id == session.subject_id).where(
+            segment.user_id == user_id,
+            segment.end_time > start,
+            segment.start_time < end
+        )
+        for segment, session in ((StudySegment, StudySession), (ArchivedStudySegment, ArchivedStudySession))
+    ))).all()
+
+
+def _clip(segment_start, segment_end, start, end):
+    return max(segment_start, start), min(segment_end, end)
+
+
+def totals_by_subject(user_id, start, end):
+    """[start, end) 内每个科目的学习秒数，区间跨越边界的部分被截掉。"""
+    totals = {}
+    for segment_start, segment_end, subject in overlapping_segments(user_id, start, end):
+        clipped_start, clipped_end = _clip(segment_start, segment_end, start, end)
+        totals[subject] = totals.get(subject, 0) + (clipped_end - clipped_start).total_seconds()
+    return totals
+
+
+def _next_local_hour(moment, tz):
+    """moment（带时区）之后的下一个本地整点。时区偏移（含夏令时切换）都发生在整点，按本地分秒推算即可。"""
+    local = moment.astimezone(tz)
+    return moment + HOUR - datetime.timedelta(minutes=local.minute, seconds=local.second, microseconds=local.microsecond)
+
+
+def local_breakdown(user_id, first_day, last_day, tz_name):
+    """按用户时区统计 [first_day, last_day] 内每天、每个整点小时（0-23）以及每个科目的学习秒数。
+
+    区间在本地零点、整点处被切分，跨午夜的会话会分别计入两天。
+    """
+    tz = ZoneInfo(tz_name)
+    utc = datetime.timezone.utc
+    start = datetime.datetime.combine(first_day, datetime.time(), tz).astimezone(utc)
+    end = datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time(), tz).astimezone(utc)
+
+    days, hours, subjects = {}, [0.0] * 24, {}
+    for segment_start, segment_end, subject in overlapping_segments(user_id, start.replace(tzinfo=None), end.replace(tzinfo=None)):
+        cursor, stop = _clip(segment_start.replace(tzinfo=utc), segment_end.replace(tzinfo=utc), start, end)
+        subjects[subject] = subjects.get(subject, 0) + (stop - cursor).total_seconds()
+        while cursor < stop:
+            piece_end = min(_next_local_hour(cursor, tz), stop)
+            local = cursor.astimezone(tz)
+            seconds = (piece_end - cursor).total_seconds()
+            days[local.date()] = days.get(local.date(), 0) + seconds
+            hours[local.hour] += seconds
+            cursor = piece_end
+
+    day_list, day = [], first_day
+    while day <= last_day:
+        day_list.append({'date': day.isoformat(), 'seconds': round(days.get(day, 0))})
+        day += datetime.timedelta(days=1)
+    return {
+        'timezone': tz_name,
+        'days': day_list,
+        'hours': [round(seconds) for seconds in hours],
+        'subjects': [{'subject': name, 'seconds': round(seconds)} for name, seconds in sorted(subjects.items())],
+        'total_seconds': round(sum(subjects.values())),
+    }
@@ -0,0 +1,134 @@
+"""学习会话的状态机：未开始 → active ⇄ paused → completed。
+
+每个状态转换都是一条带条件的 INSERT/UPDATE ... RETURNING，经过的时长在 SQL 中计算，
+因此多个 gunicorn worker 或多个标签页同时操作时不会出现“读取-计算-写回”的竞争：
+条件不满足的请求不会修改任何行，也就不会重复累加或丢失时长。
+"""
+import datetime
+from sqlalchemy import update, insert, select, exists, literal, case, cast, func
+from sqlalchemy.exc import IntegrityError
+from project import db, dataversion, segments
+from project.models import StudySession, Subject, OPEN_SESSION_STATUSES
+from project.rollup import add_to_rollup, refresh_rollup_day
+
+# 可在压力测试中替换为可控时钟
+utcnow = datetime.datetime.utcnow
+
+
+class TransitionError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _elapsed_seconds(now):
+    """SQL 表达式：从 last_start_time 到 now 经过的整秒数。"""
+    now = literal(now, db.DateTime)
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # julianday 只精确到毫秒，先换算为毫秒取整再截断为秒
+        return cast(func.round((func.julianday(now) - func.julianday(StudySession.last_start_time)) * 86400000) / 1000, db.Integer)
+    if dialect == 'postgresql':
+        return cast(func.floor(func.extract('epoch', now - StudySession.last_start_time)), db.Integer)
+    raise RuntimeError(f'不支持的数据库方言: {dialect}')
+
+
+def _open_session_filter(user_id):
+    return (StudySession.user_id == user_id) & StudySession.status.in_(OPEN_SESSION_STATUSES)
+
+
+def _execute_returning(statement):
+    return db.session.execute(
+        statement.returning(StudySession),
+        execution_options={'populate_existing': True}
+    ).scalars().first()
+
+
+def start(user_id, subject_id, now=None):
+    """仅当科目属于该用户且没有进行中的会话时插入一条 active 会话。"""
+    now = now or utcnow()
+    source = select(
+        literal(user_id), Subject.id, literal('active'), literal(now, db.DateTime), literal(now, db.DateTime), literal(0)
+    ).where(
+        Subject.id == subject_id,
+        Subject.user_id == user_id,
+        ~exists().where(_open_session_filter(user_id))
+    )
+    try:
+        session_id = db.session.execute(
+            insert(StudySession).from_select(
+                ['user_id', 'subject_id', 'status', 'creation_time', 'last_start_time', 'accumulated_seconds'], source
+            ).returning(StudySession.id)
+        ).scalar()
+    except IntegrityError:
+        # 并发插入被“每个用户仅一个进行中会话”的唯一索引拦下
+        db.session.rollback()
+        session_id = None
+
+    if session_id is None:
+        db.session.rollback()
+        if db.session.query(exists().where(_open_session_filter(user_id))).scalar():
+            raise TransitionError('已有正在进行的学习会话', 400)
+        raise TransitionError('选择的科目无效', 404)
+
+    add_to_rollup(user_id, subject_id, now, 0)
+    segments.open_segment(session_id, user_id, now)
+    dataversion.bump(user_id)
+    db.session.commit()
+    return db.session.get(StudySession, session_id)
+
+
+def toggle(user_id, action=None, now=None):
+    """暂停或继续。action 为 'pause'/'resume' 时只在当前状态匹配时生效，为空时切换状态。"""
+    now = now or utcnow()
+    accumulated = func.coalesce(StudySession.accumulated_seconds, 0)
+    statement = update(StudySession)
+    if action == 'pause':
+        statement = statement.where(StudySession.user_id == user_id, StudySession.status == 'active').values(
+            status='paused', accumulated_seconds=accumulated + _elapsed_seconds(now), last_start_time=None)
+    elif action == 'resume':
+        statement = statement.where(StudySession.user_id == user_id, StudySession.status == 'paused').values(
+            status='active', last_start_time=now)
+    else:
+        # SET 中的表达式都基于更新前的行求值
+        was_active = StudySession.status == 'active'
+        statement = statement.where(_open_session_filter(user_id)).values(
+            status=case((was_active, 'paused'), else_='active'),
+            accumulated_seconds=accumulated + case((was_active, _elapsed_seconds(now)), else_=0),
+            last_start_time=case((was_active, None), else_=literal(now, db.DateTime)))
+
+    session = _execute_returning(statement)
+    if session is None:
+        db.session.rollback()
+        raise TransitionError('No active session found', 404)
+    if session.status == 'paused':
+        segments.close_segment(session.id, now)
+        refresh_rollup_day(session.user_id, session.subject_id, session.creation_time)
+    else:
+        segments.open_segment(session.id, user_id, now)
+    dataversion.bump(user_id)
+    db.session.commit()
+    return session
+
+
+def stop(user_id, now=None):
+    """结束进行中的会话；若仍在计时，则把最后一段时长一并累加。"""
+    now = now or utcnow()
+    accumulated = func.coalesce(StudySession.accumulated_seconds, 0)
+    statement = update(StudySession).where(_open_session_filter(user_id)).values(
+        status='completed',
+        accumulated_seconds=accumulated + case((StudySession.status == 'active', _elapsed_seconds(now)), else_=0),
+        end_time=now,
+        last_start_time=None)
+
+    session = _execute_returning(statement)
+    if session is None:
+        db.session.rollback()
+        raise TransitionError('No active session found', 404)
+    # 从暂停状态结束时没有未结束的区间，这条 UPDATE 不影响任何行
+    segments.close_segment(session.id, now)
+    refresh_rollup_day(session.user_id, session.subject_id, session.creation_time)
+    dataversion.bump(user_id)
+    db.session.commit()
+    return session
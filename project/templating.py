@@ -0,0 +1,29 @@
+"""模板加载：文件系统字节码缓存与预编译。
+
+Jinja 第一次渲染某个模板时要解析并编译成 Python 代码。字节码缓存把编译结果写入 JINJA_BYTECODE_CACHE_DIR，
+worker 重启或冷启动后直接加载；TEMPLATE_PRELOAD 则在创建应用时就把全部模板载入内存。
+"""
+import os
+from jinja2 import FileSystemBytecodeCache
+
+
+def init_templates(app):
+    cache_dir = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if cache_dir:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            # 只读部署等场景下退回为不缓存，模板照常在内存中编译
+            app.logger.warning(f'无法创建模板字节码缓存目录 {cache_dir}，不使用字节码缓存: {e}')
+        else:
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    if app.config['TEMPLATE_PRELOAD']:
+        compile_templates(app)
+
+
+def compile_templates(app):
+    """加载全部模板：编译结果写入字节码缓存（若已配置），并留在 Jinja 环境的内存缓存中。返回模板名列表。"""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
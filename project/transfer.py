@@ -0,0 +1,184 @@
+import csv
+import datetime
+import io
+import json
+import time
+from collections import defaultdict
+from project import db, dataversion, segments
+from project.models import StudySession, ArchivedStudySession, Subject
+from project.rollup import add_to_rollup
+
+EXPORT_FIELDS = ['subject', 'status', 'creation_time', 'end_time', 'accumulated_seconds']
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+
+
+def _format_time(value):
+    return value.isoformat() + 'Z' if value else None
+
+
+def _parse_time(value, field):
+    if not value:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{field} 必须是 ISO 8601 格式的字符串')
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+# --- 导出 ---
+def export_rows(user_id):
+    """按创建时间顺序逐行产出该用户的全部会话（含归档会话），借助 yield_per 保持内存占用恒定。"""
+    sessions = db.union_all(*(
+        db.select(Subject.name, model.status, model.creation_time, model.end_time, model.accumulated_seconds, model.id)
+        .join(Subject, Subject.id == model.subject_id).where(model.user_id == user_id)
+        for model in (StudySession, ArchivedStudySession)
+    )).subquery()
+    query = db.select(*list(sessions.c)[:5]).order_by(sessions.c.creation_time, sessions.c.id)
+    for name, status, creation_time, end_time, accumulated_seconds in db.session.execute(query.execution_options(yield_per=1000)):
+        yield {
+            'subject': name,
+            'status': status,
+            'creation_time': _format_time(creation_time),
+            'end_time': _format_time(end_time),
+            'accumulated_seconds': accumulated_seconds or 0,
+        }
+
+
+def export_lines(user_id, fmt):
+    """把 export_rows 编码为 csv 或 ndjson 文本行。"""
+    if fmt == 'ndjson':
+        for row in export_rows(user_id):
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in export_rows(user_id):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+# --- 导入 ---
+def read_rows(text_stream, fmt):
+    """从文本流中逐行解析记录（不会一次性读入整个文件）。"""
+    if fmt == 'ndjson':
+        for line in text_stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # 交给 import_sessions 统计为跳过的记录
+                    yield None
+    else:
+        yield from csv.DictReader(text_stream)
+
+
+def _to_session_row(user_id, record):
+    creation_time = _parse_time(record.get('creation_time'), 'creation_time')
+    if creation_time is None:
+        raise ValueError('缺少 creation_time')
+    # NDJSON 中的值可能是任意 JSON 类型，CSV 中则都是字符串
+    accumulated_seconds = record.get('accumulated_seconds') or 0
+    if isinstance(accumulated_seconds, bool) or not isinstance(accumulated_seconds, (int, str)):
+        raise ValueError('accumulated_seconds 必须是整数')
+    accumulated_seconds = int(accumulated_seconds)
+    if accumulated_seconds < 0:
+        raise ValueError('accumulated_seconds 不能为负数')
+    end_time = _parse_time(record.get('end_time'), 'end_time') or creation_time + datetime.timedelta(seconds=accumulated_seconds)
+    # 导入的都是历史记录，一律视为已完成，避免与“每个用户仅一个进行中会话”冲突
+    return {
+        'user_id': user_id,
+        'status': 'completed',
+        'creation_time': creation_time,
+        'last_start_time': None,
+        'end_time': end_time,
+        'accumulated_seconds': accumulated_seconds,
+    }
+
+
+class _SubjectResolver:
+    """科目名称 → id 的内存映射，首次遇到的新科目才写入数据库。"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.ids = {name: id for id, name in db.session.query(Subject.id, Subject.name).filter_by(user_id=user_id)}
+        self.created = 0
+
+    def resolve(self, name):
+        if name is not None and not isinstance(name, str):
+            raise ValueError('科目名称必须是字符串')
+        name = (name or '').strip()
+        if not name:
+            raise ValueError('缺少科目名称')
+        if name not in self.ids:
+            subject = Subject(name=name, user_id=self.user_id)
+            db.session.add(subject)
+            db.session.flush()
+            self.ids[name] = subject.id
+            self.created += 1
+        return self.ids[name]
+
+
+def _flush_chunk(user_id, rows):
+    inserted = db.session.execute(
+        db.insert(StudySession).returning(StudySession.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    # 历史记录没有暂停/继续信息，每条会话写入一段近似区间
+    segments.replace_segments([], [
+        (session_id, user_id, *segments.synthetic_segment(row['creation_time'], row['end_time'], row['accumulated_seconds']))
+        for session_id, row in zip(inserted, rows)
+    ])
+    # 同一批次内先按 (科目, 日期) 合并，再写入按日汇总表
+    deltas = defaultdict(int)
+    for row in rows:
+        deltas[(row['subject_id'], row['creation_time'].date())] += row['accumulated_seconds']
+    for (subject_id, day), seconds in deltas.items():
+        add_to_rollup(user_id, subject_id, datetime.datetime.combine(day, datetime.time()), seconds)
+    dataversion.bump(user_id)
+    db.session.commit()
+
+
+def import_sessions(user_id, records, chunk_size=IMPORT_CHUNK_SIZE):
+    """分批导入记录，每批一次 executemany 插入并单独提交。返回包含吞吐量的统计信息。
+
+    文件不是有效的 UTF-8 时停止读取：已提交的批次保留，stats['error'] 给出原因，imported 为已导入的条数。
+    """
+    started = time.perf_counter()
+    resolver = _SubjectResolver(user_id)
+    stats = {'imported': 0, 'skipped': 0, 'errors': []}
+    chunk = []
+    try:
+        for line_no, record in enumerate(records, start=1):
+            try:
+                if not isinstance(record, dict):
+                    raise ValueError('无法解析的记录')
+                row = _to_session_row(user_id, record)
+                row['subject_id'] = resolver.resolve(record.get('subject'))
+                chunk.append(row)
+            except (ValueError, TypeError, OverflowError) as e:
+                stats['skipped'] += 1
+                if len(stats['errors']) < MAX_REPORTED_ERRORS:
+                    stats['errors'].append(f'第 {line_no} 条: {e}')
+                continue
+            if len(chunk) >= chunk_size:
+                _flush_chunk(user_id, chunk)
+                stats['imported'] += len(chunk)
+                chunk = []
+    except UnicodeDecodeError:
+        stats['error'] = '文件不是有效的 UTF-8 编码，导入已中止'
+    if chunk:
+        _flush_chunk(user_id, chunk)
+        stats['imported'] += len(chunk)
+    db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    stats['subjects_created'] = resolver.created
+    stats['seconds'] = round(elapsed, 3)
+    stats['rows_per_second'] = round(stats['imported'] / elapsed, 1) if elapsed > 0 else None
+    return stats
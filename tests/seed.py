@@ -0,0 +1,55 @@
+import datetime
+import random
+from project import db
+from project.models import User, Subject, StudySession, StudySegment
+from project.rollup import rebuild_rollup
+
+SEED_PASSWORD = 'password'
+
+
+def seed_synthetic_data(n_users=3, n_subjects=5, n_sessions=400, days=365, seed=0):
+    """生成 用户 × 科目 × 会话 的合成数据，用于查询计划测试和基准测试。
+
+    每个用户得到 n_subjects 个科目和 n_sessions 条已完成的会话，会话均匀分布在最近 days 天内。
+    返回创建的用户名列表，密码统一为 SEED_PASSWORD。
+    """
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    # 所有用户共用同一个密码哈希，避免逐个计算
+    template = User(username='_')
+    template.set_password(SEED_PASSWORD)
+
+    usernames = []
+    for u in range(n_users):
+        user = User(username=f'seed_user_{u}', password_hash=template.password_hash)
+        db.session.add(user)
+        db.session.flush()
+        subjects = [Subject(name=f'科目{s}', user_id=user.id) for s in range(n_subjects)]
+        db.session.add_all(subjects)
+        db.session.flush()
+
+        rows = []
+        for _ in range(n_sessions):
+            creation_time = now - datetime.timedelta(seconds=rng.randrange(days * 86400))
+            seconds = rng.randrange(300, 3 * 3600)
+            rows.append({
+                'user_id': user.id,
+                'subject_id': rng.choice(subjects).id,
+                'status': 'completed',
+                'creation_time': creation_time,
+                'end_time': creation_time + datetime.timedelta(seconds=seconds),
+                'accumulated_seconds': seconds,
+            })
+        if rows:
+            db.session.execute(db.insert(StudySession), rows)
+            # 合成会话没有暂停，每条会话对应一段完整的区间
+            db.session.execute(db.insert(StudySegment).from_select(
+                ['session_id', 'user_id', 'start_time', 'end_time'],
+                db.select(StudySession.id, StudySession.user_id, StudySession.creation_time, StudySession.end_time)
+                .where(StudySession.user_id == user.id)
+            ))
+        usernames.append(user.username)
+
+    db.session.commit()
+    rebuild_rollup()
+    return usernames
@@ -0,0 +1,118 @@
+"""对各路由发出的每条 SQL 执行 EXPLAIN QUERY PLAN，确认没有全表扫描。
+
+运行：python -m pytest tests
+"""
+import datetime
+import re
+import pytest
+from sqlalchemy import event, text
+from config import TestingConfig
+from project import create_app, db
+from tests.seed import seed_synthetic_data, SEED_PASSWORD
+
+# "SCAN x" 是逐行扫描，"SCAN x USING [COVERING] INDEX" 或 "SEARCH ..." 走了索引。
+# x 可能是表名、别名或子查询名：只有同一计划中以 CO-ROUTINE/MATERIALIZE 列出的子查询（其内部计划单独检查）
+# 和 "SCAN CONSTANT ROW" 可以逐行扫描，其余都算全表扫描
+SCAN_RE = re.compile(r'^SCAN (\S+)(?!.*USING (?:COVERING )?INDEX)')
+SUBQUERY_RE = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\S+)')
+
+
+def full_scans(details):
+    """从一条 SQL 的查询计划明细中找出全表扫描的行。"""
+    subqueries = {m.group(1) for m in map(SUBQUERY_RE.match, details) if m}
+    return [detail for detail in details
+            if (m := SCAN_RE.match(detail)) and detail != 'SCAN CONSTANT ROW' and m.group(1) not in subqueries]
+
+
+def _route_calls(client):
+    """按 history / index 页面的实际使用方式依次调用各个路由。"""
+    today = datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    day_ago = (today - datetime.timedelta(days=30)).strftime('%Y-%m-%d')
+
+    yield 'index', lambda: client.get('/')
+    yield 'get_subjects', lambda: client.get('/subjects')
+    yield 'get_study_data (today)', lambda: client.get('/get_study_data', query_string={
+        'start_date_utc': today.isoformat() + 'Z',
+        'end_date_utc': (today + datetime.timedelta(days=1)).isoformat() + 'Z'})
+    yield 'get_study_data (range)', lambda: client.get('/get_study_data', query_string={
+        'start_date': day_ago, 'end_date': today.strftime('%Y-%m-%d')})
+    yield 'get_study_data (all)', lambda: client.get('/get_study_data')
+    yield 'analytics_summary', lambda: client.get('/analytics/summary')
+    yield 'analytics_intervals', lambda: client.get('/analytics/intervals', query_string={
+        'start_date': day_ago, 'end_date': today.strftime('%Y-%m-%d'), 'tz': 'Asia/Shanghai'})
+    first_page = {}
+    yield 'list_sessions', lambda: first_page.update(client.get('/sessions').get_json())
+    yield 'list_sessions (cursor)', lambda: client.get('/sessions', query_string={'cursor': first_page['next_cursor']})
+    yield 'start_session', lambda: client.post('/start_session', json={'subject_id': first_subject_id(client)})
+    yield 'toggle_pause_session (pause)', lambda: client.post('/toggle_pause_session')
+    yield 'toggle_pause_session (resume)', lambda: client.post('/toggle_pause_session')
+    yield 'stop_session', lambda: client.post('/stop_session')
+    yield 'modify_session', lambda: client.post(f"/modify_session/{first_page['sessions'][0]['id']}", json={'duration_seconds': 60})
+    yield 'delete_sessions', lambda: client.post('/delete_sessions', json={'session_ids': [first_page['sessions'][1]['id']]})
+    yield 'add_subject', lambda: client.post('/add_subject', json={'name': '新科目'})
+    yield 'update_subject', lambda: client.post(f'/update_subject/{first_subject_id(client)}', json={'name': '改名科目'})
+    yield 'delete_subject', lambda: client.post(f'/delete_subject/{first_subject_id(client)}')
+
+
+def first_subject_id(client):
+    return client.get('/subjects').get_json()[0]['id']
+
+
+@pytest.fixture(scope='module')
+def route_plans(tmp_path_factory):
+    """在临时 SQLite 文件上种子数据，逐个调用路由，返回 [(路由名, SQL, 查询计划明细列表)]。"""
+    class QueryPlanConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path_factory.mktemp('queryplan') / 'plan.db')
+
+    app = create_app(QueryPlanConfig)
+    with app.app_context():
+        usernames = seed_synthetic_data(3, 5, 400)
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        engine = db.engine
+
+    captured = []
+    current_route = [None]
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            captured.append((current_route[0], statement, parameters))
+
+    client = app.test_client()
+    client.post('/login', data={'username': usernames[0], 'password': SEED_PASSWORD})
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        for name, call in _route_calls(client):
+            current_route[0] = name
+            call()
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+    plans = []
+    with app.app_context(), db.engine.connect() as conn:
+        for route, statement, parameters in captured:
+            if statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                plans.append((route, statement, [row[-1] for row in plan]))
+        yield plans
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_full_scans_rule():
+    assert full_scans(['SCAN study_session']) == ['SCAN study_session']
+    # 别名同样视为全表扫描
+    assert full_scans(['SCAN s', 'SEARCH subject USING INTEGER PRIMARY KEY (rowid=?)']) == ['SCAN s']
+    assert full_scans(['SCAN study_session USING INDEX ix_study_session_user_creation',
+                       'SCAN subject USING COVERING INDEX ix_subject_user', 'SCAN CONSTANT ROW']) == []
+    assert full_scans(['CO-ROUTINE sessions', 'SEARCH study_session USING INDEX ix_study_session_user_subject (user_id=?)',
+                       'SCAN sessions']) == []
+    assert full_scans(['CO-ROUTINE (subquery-1)', 'SCAN (subquery-1)']) == []
+    assert full_scans(['MATERIALIZE anon_1', 'SCAN archived_study_session', 'SCAN anon_1']) == ['SCAN archived_study_session']
+
+
+def test_routes_use_indexes(route_plans):
+    assert route_plans
+    problems = [f'{route}: {detail}\n    {" ".join(statement.split())}'
+                for route, statement, details in route_plans for detail in full_scans(details)]
+    assert not problems, '发现全表扫描：\n' + '\n'.join(problems)